@@ -1,4 +1,5 @@
 import os
+import sys
 import shutil
 import PyInstaller.__main__
 from typing import List
@@ -20,12 +21,27 @@ def build_game():
     if os.path.exists(f"{build_name}.spec"):
         shutil.rmtree(f"{build_name}.spec")
 
+    # --- Validate data, compile maps and pack graphics ---
+    # the game reads data/compiled/maps, so the Tiled sources are left out of the build
+    sys.path.insert(0, "code")
+    from data_compiler import build
+    from map_compiler import compile_all
+    from atlas import build_atlas
+    # a DataError here stops the build before anything is packaged
+    build()
+    compile_all("data", "maps")
+    build_atlas()
+
+    staging_dir = os.path.join(build_dir, "staging")
+    shutil.copytree("data", os.path.join(staging_dir, "data"), ignore=shutil.ignore_patterns("*.tmx", "*.tsx"))
+
     # --- Prepare additional data arguments ---
     # PyInstaller format: "source_path;destination_folder_inside_dist"
     datas: List[str] = []
     for folder in extra_dirs:
-        if os.path.exists(folder):
-            datas.append(f"{folder}{os.pathsep}{folder}")
+        source = os.path.join(staging_dir, folder) if folder == "data" else folder
+        if os.path.exists(source):
+            datas.append(f"{source}{os.pathsep}{folder}")
 
     # --- Build command ---
     pyinstaller_args = [
@@ -0,0 +1,137 @@
+import os
+import sys
+import json
+import pygame
+from singleton import SingletonMeta
+from support import get_path
+from typing import Dict, List, Optional, Tuple
+
+ATLAS_FOLDER = ("data", "compiled", "atlas")
+ATLAS_MANIFEST = "manifest.json"
+ATLAS_PAGE_SIZE = 2048
+ATLAS_PADDING = 1
+
+# everything the support importers load, the map objects are loaded by pytmx instead
+ATLAS_SOURCES = [
+    ("graphics", "attacks"),
+    ("graphics", "backgrounds"),
+    ("graphics", "characters"),
+    ("graphics", "icons"),
+    ("graphics", "monsters"),
+    ("graphics", "other"),
+    ("graphics", "ui"),
+    ("graphics", "tilesets", "water"),
+    ("graphics", "tilesets", "coast.png")
+]
+
+
+def atlas_key(path: str) -> str:
+    return os.path.relpath(os.path.normpath(path), get_path()).replace(os.sep, '/')
+
+
+# region packing
+
+def collect_sources() -> List[str]:
+    paths = []
+    for source in ATLAS_SOURCES:
+        full_path = get_path(*source)
+        if os.path.isfile(full_path):
+            paths.append(full_path)
+        else:
+            for folder_path, _, file_names in os.walk(full_path):
+                paths.extend(os.path.join(folder_path, file_name) for file_name in file_names if file_name.lower().endswith('.png'))
+    return sorted(paths)
+
+def pack(sizes: Dict[str, Tuple[int, int]], page_size: int = ATLAS_PAGE_SIZE) -> Tuple[List[Tuple[int, int]], Dict[str, Tuple[int, int, int, int, int]]]:
+    # shelf packing, tallest images first
+    pages: List[Tuple[int, int]] = []
+    placements: Dict[str, Tuple[int, int, int, int, int]] = {}
+    x = y = shelf_height = 0
+
+    for key in sorted(sizes, key = lambda key: (-sizes[key][1], -sizes[key][0], key)):
+        width, height = sizes[key]
+        if not pages or x + width > page_size:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        if not pages or y + height > page_size:
+            pages.append((0, 0))
+            x = y = shelf_height = 0
+
+        placements[key] = (len(pages) - 1, x, y, width, height)
+        page_width, page_height = pages[-1]
+        pages[-1] = (max(page_width, x + width), max(page_height, y + height))
+        x += width + ATLAS_PADDING
+        shelf_height = max(shelf_height, height + ATLAS_PADDING)
+
+    return pages, placements
+
+def build_atlas() -> Dict[str, object]:
+    images = {atlas_key(path): (path, pygame.image.load(path)) for path in collect_sources()}
+    pages, placements = pack({key: surf.get_size() for key, (_, surf) in images.items()})
+
+    folder = get_path(*ATLAS_FOLDER)
+    os.makedirs(folder, exist_ok = True)
+    page_surfs = [pygame.Surface(size, pygame.SRCALPHA) for size in pages]
+    for key, (page, x, y, _, _) in placements.items():
+        # max-blend onto the cleared page copies the pixels, alpha included, instead of blending them
+        page_surfs[page].blit(images[key][1], (x, y), special_flags = pygame.BLEND_RGBA_MAX)
+
+    page_names = []
+    for index, page_surf in enumerate(page_surfs):
+        page_names.append(f"page{index}.png")
+        pygame.image.save(page_surf, os.path.join(folder, page_names[-1]))
+
+    manifest = {
+        'pages': page_names,
+        'frames': {
+            key: {'page': page, 'rect': [x, y, width, height], 'mtime': os.stat(images[key][0]).st_mtime_ns}
+            for key, (page, x, y, width, height) in placements.items()
+        }
+    }
+    with open(os.path.join(folder, ATLAS_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+# endregion
+
+# region runtime
+
+class Atlas(metaclass=SingletonMeta):
+    def __init__(self) -> None:
+        self.frames: Dict[str, dict] = {}
+        self.page_names: List[str] = []
+        self.pages: Dict[int, pygame.Surface] = {}
+        # a packaged build ships the atlas next to untouched sources, only a dev checkout can go stale
+        self.check_stale = not hasattr(sys, "_MEIPASS")
+
+        try:
+            with open(get_path(*ATLAS_FOLDER, ATLAS_MANIFEST), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.frames = manifest['frames']
+            self.page_names = manifest['pages']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def get_page(self, index: int) -> pygame.Surface:
+        if index not in self.pages:
+            self.pages[index] = pygame.image.load(get_path(*ATLAS_FOLDER, self.page_names[index])).convert_alpha()
+        return self.pages[index]
+
+    def get(self, path: str) -> Optional[pygame.Surface]:
+        frame = self.frames.get(atlas_key(path))
+        if frame is None:
+            return None
+        if self.check_stale:
+            try:
+                if os.stat(path).st_mtime_ns != frame['mtime']:
+                    return None
+            except OSError:
+                pass
+        return self.get_page(frame['page']).subsurface(frame['rect'])
+
+# endregion
+
+
+if __name__ == "__main__":
+    pygame.init()
+    manifest = build_atlas()
+    print(f"packed {len(manifest['frames'])} images into {len(manifest['pages'])} pages")
@@ -0,0 +1,158 @@
+import os
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")  # once per worker process otherwise
+
+import sys
+import csv
+import time
+import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from battle_engine import BattleEngine, simulate
+from batch_sim import BatchBattles, SpeciesTable, PLAYER, NO_WINNER, np
+from game_data import MonsterData
+from monster import Monster
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# (level, player species, opponent species)
+Pairing = Tuple[int, str, str]
+
+RESULT_FIELDS = ['level', 'player', 'opponent', 'battles', 'win_rate', 'avg_turns', 'avg_time', 'avg_xp']
+
+_table: Optional[SpeciesTable] = None
+
+
+def get_pairings(species: List[str], levels: List[int]) -> List[Pairing]:
+    return [(level, player, opponent) for level in levels for player in species for opponent in species]
+
+def get_chunks(pairings: List[Pairing], chunk_size: int) -> Iterator[List[Pairing]]:
+    for start in range(0, len(pairings), chunk_size):
+        yield pairings[start:start + chunk_size]
+
+def make_row(pairing: Pairing, battles: int, win_rate: float, avg_turns: float, avg_time: float, avg_xp: float) -> Dict[str, object]:
+    level, player, opponent = pairing
+    return {
+        'level': level, 'player': player, 'opponent': opponent, 'battles': battles,
+        'win_rate': round(win_rate, 4), 'avg_turns': round(avg_turns, 2), 'avg_time': round(avg_time, 2), 'avg_xp': round(avg_xp, 1)
+    }
+
+def get_total_xp(monster: Monster) -> float:
+    # xp earned since level 1, update_xp never loses any of it when levelling
+    return sum(level * 150 for level in range(1, monster.level)) + monster.xp
+
+
+# region workers
+
+def run_chunk_batch(pairings: List[Pairing], battles: int, seed: int, dt: float) -> List[Dict[str, object]]:
+    global _table
+    if _table is None:
+        _table = SpeciesTable()
+
+    player_teams = [[(player, level)] for level, player, _ in pairings for _ in range(battles)]
+    opponent_teams = [[(opponent, level)] for level, _, opponent in pairings for _ in range(battles)]
+    batch = BatchBattles(player_teams, opponent_teams, seed, _table)
+    batch.run(dt)
+
+    rows = []
+    for index, pairing in enumerate(pairings):
+        part = slice(index * battles, (index + 1) * battles)
+        finished = batch.winner[part] != NO_WINNER
+        win_rate = float((batch.winner[part][finished] == PLAYER).mean()) if finished.any() else 0.0
+        rows.append(make_row(pairing, battles, win_rate, float(batch.turns[part].mean()), float(batch.elapsed[part].mean()), float(batch.xp_awarded[part].mean())))
+    return rows
+
+def run_chunk_reference(pairings: List[Pairing], battles: int, seed: int, dt: float) -> List[Dict[str, object]]:
+    rng = random.Random(seed)
+    rows = []
+    for pairing in pairings:
+        level, player, opponent = pairing
+        wins = turns = elapsed = xp = 0
+        for _ in range(battles):
+            player_monster = Monster(player, level)
+            engine = BattleEngine({0: player_monster}, {0: Monster(opponent, level)}, rng, auto_enter = True)
+            xp_before = get_total_xp(player_monster)
+            wins += simulate(engine, dt) == 'player'
+            turns += engine.turns
+            elapsed += engine.elapsed
+            xp += get_total_xp(player_monster) - xp_before
+        rows.append(make_row(pairing, battles, wins / battles, turns / battles, elapsed / battles, xp / battles))
+    return rows
+
+def run_chunk(engine: str, pairings: List[Pairing], battles: int, seed: int, dt: float) -> List[Dict[str, object]]:
+    runner = run_chunk_batch if engine == 'batch' else run_chunk_reference
+    return runner(pairings, battles, seed, dt)
+
+# endregion
+
+# region output
+
+def write_results(path: str, rows: List[Dict[str, object]]) -> None:
+    if path.lower().endswith('.parquet'):
+        import pandas
+        pandas.DataFrame(rows, columns = RESULT_FIELDS).to_parquet(path, index = False)
+        return
+
+    with open(path, "w", newline = "", encoding = "utf-8") as f:
+        writer = csv.DictWriter(f, RESULT_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_matrix(path: str, rows: List[Dict[str, object]], species: List[str], level: int) -> None:
+    # player species down, opponent species across
+    win_rates = {(row['player'], row['opponent']): row['win_rate'] for row in rows if row['level'] == level}
+    with open(path, "w", newline = "", encoding = "utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(['player \\ opponent'] + species)
+        for player in species:
+            writer.writerow([player] + [f"{win_rates[(player, opponent)]:.4f}" for opponent in species])
+
+# endregion
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description = "Play every species against every other one and write win rates, battle length and xp yield.")
+    parser.add_argument("-l", "--levels", default = "5,10,20", help = "comma separated levels, both monsters share the level")
+    parser.add_argument("-n", "--battles", type = int, default = 1000, help = "battles per pairing")
+    parser.add_argument("-o", "--output", default = "balance.csv", help = "a .csv or .parquet file")
+    parser.add_argument("--matrix", action = "store_true", help = "also write one win rate matrix csv per level next to the output")
+    parser.add_argument("--species", default = None, help = "comma separated subset of species")
+    parser.add_argument("--engine", choices = ('batch', 'reference'), default = 'batch' if np is not None else 'reference')
+    parser.add_argument("--workers", type = int, default = os.cpu_count())
+    parser.add_argument("--chunk-size", type = int, default = 16, help = "pairings per task")
+    parser.add_argument("--seed", type = int, default = 0)
+    parser.add_argument("--dt", type = float, default = 0.05)
+    args = parser.parse_args(argv)
+
+    if args.engine == 'batch' and np is None:
+        sys.exit("the batch engine needs numpy, install it or pass --engine reference")
+    if args.output.lower().endswith('.parquet'):
+        try:
+            import pandas, pyarrow
+        except ImportError:
+            sys.exit("parquet output needs pandas and pyarrow, install them or write a .csv")
+
+    species = args.species.split(',') if args.species else sorted(data['name'] for data in MonsterData.all())
+    levels = [int(level) for level in args.levels.split(',')]
+    pairings = get_pairings(species, levels)
+    chunks = list(get_chunks(pairings, args.chunk_size))
+
+    # one seed per chunk, so the results do not depend on the worker count
+    start = time.perf_counter()
+    rows = []
+    with ProcessPoolExecutor(args.workers) as executor:
+        futures = [executor.submit(run_chunk, args.engine, chunk, args.battles, args.seed * 1000003 + index, args.dt) for index, chunk in enumerate(chunks)]
+        for future in futures:
+            rows.extend(future.result())
+    duration = time.perf_counter() - start
+
+    write_results(args.output, rows)
+    if args.matrix:
+        stem = os.path.splitext(args.output)[0]
+        for level in levels:
+            write_matrix(f"{stem}_winrate_L{level}.csv", rows, species, level)
+
+    total = len(pairings) * args.battles
+    print(f"{total} battles over {len(pairings)} pairings in {duration:.1f}s ({total / duration:.0f} battles/s) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
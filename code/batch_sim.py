@@ -0,0 +1,315 @@
+import sys
+import argparse
+from battle_engine import SIDES, ACTIVE_SLOTS
+from game_data import MonsterData, AttackData, ElementData
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # only the balancing tools need numpy, the game runs without it
+    np = None
+
+# (species name, level) for every monster of a team, in team order
+Team = Sequence[Tuple[str, int]]
+
+PLAYER, OPPONENT = SIDES.index('player'), SIDES.index('opponent')
+NO_WINNER = -1
+SIDE_ORDER = 1 << 32
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise ImportError("batch simulation needs numpy, install it with 'pip install numpy'")
+
+
+class SpeciesTable:
+    """The monster and attack json flattened into arrays indexed by species and attack number."""
+    def __init__(self) -> None:
+        require_numpy()
+        monsters = sorted(MonsterData.all(), key = lambda data: data['name'])
+        attacks = sorted(AttackData.all(), key = lambda data: data['name'])
+
+        self.species: Dict[str, int] = {data['name']: index for index, data in enumerate(monsters)}
+        self.attacks: Dict[str, int] = {data['name']: index for index, data in enumerate(attacks)}
+
+        # base stats, multiplied by the level like Monster.get_stat
+        stats = lambda stat: np.array([data['stats'][stat] for data in monsters], dtype = np.float64)
+        self.max_health = stats('max_health')
+        self.max_energy = stats('max_energy')
+        self.attack = stats('attack')
+        self.defense = stats('defense')
+        self.speed = stats('speed')
+        self.element = np.array([data['element_id'] for data in monsters], dtype = np.int64)
+
+        # abilities in json order, locked ones padded with an unreachable level
+        width = max(len(data['abilities']) for data in monsters)
+        self.abilities = np.zeros((len(monsters), width), dtype = np.int64)
+        self.unlock_level = np.full((len(monsters), width), np.iinfo(np.int64).max, dtype = np.int64)
+        for index, data in enumerate(monsters):
+            for column, (level, ability) in enumerate(data['abilities'].items()):
+                self.abilities[index, column] = self.attacks[ability]
+                self.unlock_level[index, column] = int(level)
+
+        self.attack_amount = np.array([data['amount'] for data in attacks], dtype = np.float64)
+        self.attack_cost = np.array([data['cost'] for data in attacks], dtype = np.float64)
+        self.attack_element = np.array([data['element_id'] for data in attacks], dtype = np.int64)
+        self.attack_own_side = np.array([data['target'] == 'player' for data in attacks])
+
+        # read after the data above interned every element
+        self.multiplier = np.array(ElementData.matrix, dtype = np.float64)
+
+
+class BatchBattles:
+    """
+    Many battles played at once with BattleEngine's rules and simulate()'s ai.
+
+    Every monster stat is a column shaped (battle, side, team index), every battle slot
+    holds the team index fighting there or -1. Each step jumps every running battle straight
+    to its next turn and resolves it, like simulate does.
+    """
+    def __init__(self, player_teams: Sequence[Team], opponent_teams: Sequence[Team], seed: Optional[int] = None, table: Optional[SpeciesTable] = None) -> None:
+        require_numpy()
+        if len(player_teams) != len(opponent_teams):
+            raise ValueError("every battle needs a player and an opponent team")
+
+        self.table = table or SpeciesTable()
+        self.rng = np.random.default_rng(seed)
+        count = len(player_teams)
+        team_size = max(max(len(team) for team in player_teams), max(len(team) for team in opponent_teams))
+        shape = (count, len(SIDES), team_size)
+
+        # team columns
+        self.exists = np.zeros(shape, dtype = bool)
+        self.species = np.zeros(shape, dtype = np.int64)
+        self.level = np.zeros(shape, dtype = np.int64)
+        for battle, teams in enumerate(zip(player_teams, opponent_teams)):
+            for side, team in enumerate(teams):
+                for index, (name, level) in enumerate(team):
+                    self.exists[battle, side, index] = True
+                    self.species[battle, side, index] = self.table.species[name]
+                    self.level[battle, side, index] = level
+
+        self.speed = self.table.speed[self.species]
+        self.defense = self.table.defense[self.species]
+        self.element = self.table.element[self.species]
+        self.health = self.table.max_health[self.species] * self.level
+        self.energy = self.table.max_energy[self.species] * self.level
+        self.xp = np.zeros(shape, dtype = np.float64)
+        self.level_up = self.level * 150
+        self.defending = np.zeros(shape, dtype = bool)
+        # new monsters roll their initiative, the player team starts from zero
+        self.initiative = self.rng.integers(0, 101, shape).astype(np.float64)
+        self.initiative[:, PLAYER] = 0
+        self.used = np.zeros(shape, dtype = bool)
+
+        # battle slots, the per tick work only touches these dense (battle, side, slot) columns
+        slots = (count, len(SIDES), ACTIVE_SLOTS)
+        self.slot_member = np.full(slots, -1, dtype = np.int64)
+        self.slot_initiative = np.zeros(slots, dtype = np.float64)
+        self.slot_speed = np.zeros(slots, dtype = np.float64)
+        # player slots before opponent slots, then entry order, like the engine's dict iteration
+        self.slot_order = np.zeros(slots, dtype = np.int64)
+        # the engine heap breaks ready time ties by push order, every (re)schedule takes the next number
+        self.slot_sequence = np.zeros(slots, dtype = np.int64)
+        self.sequence = np.full(count, len(SIDES) * ACTIVE_SLOTS, dtype = np.int64)
+        for slot in range(min(ACTIVE_SLOTS, team_size)):
+            present = self.exists[:, :, slot]
+            self.slot_member[:, :, slot] = np.where(present, slot, -1)
+            self.slot_initiative[:, :, slot] = np.where(present, self.initiative[:, :, slot], 0)
+            self.slot_speed[:, :, slot] = np.where(present, self.speed[:, :, slot] * self.level[:, :, slot], 0)
+            self.slot_order[:, :, slot] = np.arange(len(SIDES))[None, :] * SIDE_ORDER + slot
+            self.slot_sequence[:, :, slot] = np.arange(len(SIDES))[None, :] * ACTIVE_SLOTS + slot
+            self.used[:, :, slot] = present
+        self.entered = np.full(count, ACTIVE_SLOTS, dtype = np.int64)
+
+        # results
+        self.winner = np.full(count, NO_WINNER, dtype = np.int64)
+        self.done = np.zeros(count, dtype = bool)
+        self.turns = np.zeros(count, dtype = np.int64)
+        self.ticks = np.zeros(count, dtype = np.int64)
+        self.elapsed = np.zeros(count, dtype = np.float64)
+        self.xp_awarded = np.zeros(count, dtype = np.float64)
+
+    def __len__(self) -> int:
+        return len(self.winner)
+
+    def run(self, dt: float = 0.05, max_turns: int = 10000) -> 'np.ndarray':
+        for _ in range(max_turns):
+            if self.done.all():
+                break
+            self.step(dt)
+        self.elapsed = self.ticks * dt
+        return self.winner
+
+    def step(self, dt: float) -> None:
+        # like BattleEngine.advance, a whole number of ticks up to each battle's next turn
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            wait = np.where(self.slot_speed > 0, (100 - self.slot_initiative) / (self.slot_speed * dt), np.inf).min(axis = (1, 2))
+        ticks = np.where(np.isfinite(wait), np.maximum(1, np.ceil(wait - 1e-9)), 0)
+        # empty slots and finished battles have no speed
+        self.slot_initiative += self.slot_speed * (dt * ticks)[:, None, None]
+        self.ticks += ticks.astype(np.int64)
+
+        # like the engine heap, the monster that reached 100 first takes the turn, then the one scheduled first
+        ready = self.slot_initiative >= 100 - 1e-9
+        if not ready.any():
+            return
+        battles = np.flatnonzero(ready.any(axis = (1, 2)))
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            ready_at = np.where(ready[battles], (100 - self.slot_initiative[battles]) / self.slot_speed[battles], np.inf).reshape(len(battles), -1)
+        first = ready_at == ready_at.min(axis = 1)[:, None]
+        sequence = np.where(first, self.slot_sequence[battles].reshape(len(battles), -1), np.iinfo(np.int64).max)
+        side, slot = np.divmod(sequence.argmin(axis = 1), ACTIVE_SLOTS)
+        self.take_turns(battles, side, slot)
+
+    def reschedule(self, battles: 'np.ndarray', side: 'np.ndarray', slot: 'np.ndarray') -> None:
+        # one schedule per battle
+        self.sequence[battles] += 1
+        self.slot_sequence[battles, side, slot] = self.sequence[battles]
+
+    def pick(self, available: 'np.ndarray') -> 'np.ndarray':
+        # uniform choice of one True column per row, like random.choice over the matching items
+        choice = (self.rng.random(len(available)) * available.sum(axis = 1)).astype(np.int64)
+        return (np.cumsum(available, axis = 1) > choice[:, None]).argmax(axis = 1)
+
+    def take_turns(self, battles: 'np.ndarray', side: 'np.ndarray', slot: 'np.ndarray') -> None:
+        table = self.table
+        member = self.slot_member[battles, side, slot]
+        actor = (battles, side, member)
+        self.slot_initiative[battles, side, slot] = 0
+        self.reschedule(battles, side, slot)
+        self.defending[actor] = False
+        self.turns[battles] += 1
+
+        # choose_attack, any unlocked ability on a random target
+        species = self.species[actor]
+        level = self.level[actor]
+        column = self.pick(table.unlock_level[species] <= level[:, None])
+        ability = table.abilities[species, column]
+        target_side = np.where(table.attack_own_side[ability], side, 1 - side)
+        target_slot = self.pick(self.slot_member[battles, target_side] >= 0)
+        target = (battles, target_side, self.slot_member[battles, target_side, target_slot])
+
+        # attack, the energy goes first
+        max_energy = table.max_energy[species] * level
+        self.energy[actor] = np.clip(self.energy[actor] - table.attack_cost[ability], 0, max_energy)
+
+        # resolve_attack
+        amount = table.attack[species] * level * table.attack_amount[ability]
+        amount *= table.multiplier[table.attack_element[ability], self.element[target]]
+        target_defense = 1 - self.defense[target] * self.level[target] / 2000 - 0.2 * self.defending[target]
+        amount *= np.clip(target_defense, 0, 1)
+        max_health = table.max_health[self.species[target]] * self.level[target]
+        self.health[target] = np.clip(self.health[target] - amount, 0, max_health)
+
+        fainted = self.health[target] <= 0
+        if fainted.any():
+            self.check_death(battles[fainted], target_side[fainted], target_slot[fainted])
+
+    def check_death(self, battles: 'np.ndarray', side: 'np.ndarray', slot: 'np.ndarray') -> None:
+        fainted = (battles, side, self.slot_member[battles, side, slot])
+
+        # xp is shared by the player monsters on the field
+        opponent = side == OPPONENT
+        if opponent.any():
+            xp_battles = battles[opponent]
+            receivers = self.slot_member[xp_battles, PLAYER] >= 0
+            xp_amount = self.level[fainted][opponent] * 100 / np.maximum(1, receivers.sum(axis = 1))
+            self.xp_awarded[xp_battles] += xp_amount * receivers.sum(axis = 1)
+            self.update_xp(xp_battles, receivers, xp_amount)
+
+        # replacements, the first unused team member that can still fight
+        self.slot_member[battles, side, slot] = -1
+        self.slot_initiative[battles, side, slot] = 0
+        self.slot_speed[battles, side, slot] = 0
+        candidates = self.exists[battles, side] & ~self.used[battles, side] & (self.health[battles, side] > 0)
+        has_replacement = candidates.any(axis = 1)
+        replacement = candidates.argmax(axis = 1)
+
+        entering = has_replacement.nonzero()[0]
+        if len(entering):
+            entering_battles, entering_side, entering_slot = battles[entering], side[entering], slot[entering]
+            member = (entering_battles, entering_side, replacement[entering])
+            self.entered[entering_battles] += 1
+            self.slot_member[entering_battles, entering_side, entering_slot] = replacement[entering]
+            self.slot_initiative[entering_battles, entering_side, entering_slot] = self.initiative[member]
+            self.slot_speed[entering_battles, entering_side, entering_slot] = self.speed[member] * self.level[member]
+            self.slot_order[entering_battles, entering_side, entering_slot] = entering_side * SIDE_ORDER + self.entered[entering_battles]
+            self.reschedule(entering_battles, entering_side, entering_slot)
+            self.used[member] = True
+
+        # check_winner
+        defeated = ~(self.slot_member[battles, side] >= 0).any(axis = 1)
+        finished = battles[defeated]
+        self.winner[finished] = 1 - side[defeated]
+        self.done[finished] = True
+        self.slot_initiative[finished] = 0
+        self.slot_speed[finished] = 0
+
+    def update_xp(self, battles: 'np.ndarray', receivers: 'np.ndarray', amount: 'np.ndarray') -> None:
+        row, slot = np.nonzero(receivers)
+        cell = (battles[row], PLAYER, self.slot_member[battles[row], PLAYER, slot])
+        amount = amount[row]
+
+        # Monster.update_xp, at most one level per call
+        missing = self.level_up[cell] - self.xp[cell]
+        level_up = missing <= amount
+        self.xp[cell] = np.where(level_up, amount - missing, self.xp[cell] + amount)
+        self.level[cell] += level_up
+        self.level_up[cell] = np.where(level_up, self.level[cell] * 150, self.level_up[cell])
+        self.slot_speed[battles[row], PLAYER, slot] = self.speed[cell] * self.level[cell]
+
+        # a speed change reschedules, in the order the engine walks the player side
+        changed = np.zeros(receivers.shape, dtype = bool)
+        changed[row, slot] = level_up & (self.speed[cell] > 0)
+        order = np.where(changed, self.slot_order[battles, PLAYER], np.iinfo(np.int64).max)
+        rank = (order[:, :, None] > order[:, None, :]).sum(axis = 2)
+        self.slot_sequence[battles[row], PLAYER, slot] = np.where(changed[row, slot], self.sequence[battles[row]] + rank[row, slot] + 1, self.slot_sequence[battles[row], PLAYER, slot])
+        self.sequence[battles] += changed.sum(axis = 1)
+
+    def get_win_rate(self) -> float:
+        finished = self.winner != NO_WINNER
+        return float((self.winner[finished] == PLAYER).mean()) if finished.any() else 0.0
+
+
+def parse_team(text: str) -> List[Tuple[str, int]]:
+    # "Charmadillo:12,Finsta:10"
+    return [(name, int(level)) for name, level in (member.split(':') for member in text.split(','))]
+
+
+def run_reference(player_team: Team, opponent_team: Team, count: int, seed: Optional[int], dt: float) -> float:
+    import random
+    from battle_engine import BattleEngine, simulate
+    from monster import Monster
+
+    rng = random.Random(seed)
+    wins = 0
+    for _ in range(count):
+        engine = BattleEngine(
+            {index: Monster(name, level) for index, (name, level) in enumerate(player_team)},
+            {index: Monster(name, level) for index, (name, level) in enumerate(opponent_team)},
+            rng, auto_enter = True
+        )
+        wins += simulate(engine, dt) == 'player'
+    return wins / count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "Play one matchup many times and print the player win rate.")
+    parser.add_argument("player", help = "player team, like Charmadillo:12,Finsta:10")
+    parser.add_argument("opponent", help = "opponent team")
+    parser.add_argument("-n", "--count", type = int, default = 10000)
+    parser.add_argument("--seed", type = int, default = None)
+    parser.add_argument("--dt", type = float, default = 0.05)
+    parser.add_argument("--reference", type = int, default = 0, metavar = "N", help = "also play N battles with the BattleEngine to compare")
+    args = parser.parse_args()
+
+    try:
+        player_team, opponent_team = parse_team(args.player), parse_team(args.opponent)
+        battles = BatchBattles([player_team] * args.count, [opponent_team] * args.count, args.seed)
+    except ImportError as e:
+        sys.exit(str(e))
+    battles.run(args.dt)
+    print(f"batch:     {battles.get_win_rate():.3f} player win rate, {battles.turns.mean():.1f} turns on average")
+    if args.reference:
+        print(f"reference: {run_reference(player_team, opponent_team, args.reference, args.seed, args.dt):.3f} player win rate")
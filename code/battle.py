@@ -2,13 +2,18 @@ import pygame
 from monster import Monster
 from sprites import MonsterSprite, MonsterNameSprite, MonsterLevelSprite, MonsterStatsSprite, MonsterOutlineSprite, AttackSprite, TimedSprite
 from groups import BattleSprites
+from battle_engine import BattleEngine, BattleEvent, Combatant
 from game_data import AttackData
 from entities import Character
-from support import draw_bar
+from support import draw_bar, bar_state
 from settings import *
 from timer_ import Timer
-from typing import Dict, List, Optional, Callable
-from random import choice
+from typing import Dict, List, Optional, Callable, Tuple
+from surface_cache import flipped, grayscale
+from text_cache import render_text
+from virtual_list import VirtualList
+from controls import get_just_pressed
+from rng import get_stream
 
 
 class Battle:
@@ -23,10 +28,7 @@ class Battle:
         self.bg_surf = bg_surf
         self.monster_frames = monster_frames
         self.fonts = fonts
-        self.monster_data = {
-            'player': player_monsters,
-            'opponent': opponent_monsters
-        }
+        self.engine = BattleEngine(player_monsters, opponent_monsters, get_stream('battle'))
         self.battle_over = False
         self.end_battle = end_battle
         self.character = character
@@ -41,6 +43,7 @@ class Battle:
         self.battle_sprites = BattleSprites()
         self.player_sprites = pygame.sprite.Group()
         self.opponent_sprites = pygame.sprite.Group()
+        self.monster_sprites: Dict[Combatant, MonsterSprite] = {}
 
         # control
         self.current_monster: Optional[MonsterSprite] = None
@@ -54,33 +57,35 @@ class Battle:
             'switch': 0,
             'target': 0
         }
+        self.switch_list = VirtualList(300, 80, 4)
+        self.available_monsters: Dict[int, Monster] = {}
+        self.switch_keys: List[int] = []
+
+        # screen areas changed by the last update, for pygame.display.update
+        self.dirty_rects: List[pygame.Rect] = []
+        self.ui_state = None
 
         self.setup()
 
     def setup(self):
-        for entity, monsters in self.monster_data.items():
-            for index, monster in {k: v for k, v in monsters.items() if k <= 2}.items():
-                self.create_monster(monster, index, index, entity)
+        self.handle_events()
 
-            # remove opponent monster data
-            for i in range(len(self.opponent_sprites)):
-                del self.monster_data['opponent'][i]
-
-    def create_monster(self, monster: Monster, index: int, pos_index: int, entity: str) -> None:
-        monster.paused = False
+    def create_monster(self, combatant: Combatant) -> None:
+        monster, pos_index, entity = combatant.monster, combatant.pos_index, combatant.side
         frames = self.monster_frames['monsters'][monster.name]
         outline_frames = self.monster_frames['outlines'][monster.name]
         
         if entity == "player":
             pos = list(BATTLE_POSITIONS['left'].values())[pos_index]
             groups = (self.battle_sprites, self.player_sprites)
-            frames = {state: [pygame.transform.flip(frame, True, False) for frame in frames] for state, frames in frames.items()}
-            outline_frames = {state: [pygame.transform.flip(frame, True, False) for frame in frames] for state, frames in outline_frames.items()}
+            frames = {state: [flipped(frame, True, False) for frame in frames] for state, frames in frames.items()}
+            outline_frames = {state: [flipped(frame, True, False) for frame in frames] for state, frames in outline_frames.items()}
         else:
             pos = list(BATTLE_POSITIONS['right'].values())[pos_index]
             groups = (self.battle_sprites, self.opponent_sprites)
 
-        monster_sprite = MonsterSprite(pos, frames, groups, monster, index, pos_index, entity, self.apply_attack, self.create_monster)
+        monster_sprite = MonsterSprite(pos, frames, groups, combatant, self.apply_attack, self.enter_monster)
+        self.monster_sprites[combatant] = monster_sprite
         MonsterOutlineSprite(monster_sprite, self.battle_sprites, outline_frames)
 
         # ui
@@ -94,11 +99,15 @@ class Battle:
         level_pos = name_sprite.rect.bottomleft if entity == 'player' else name_sprite.rect.bottomright
         MonsterLevelSprite(entity, level_pos, monster_sprite, self.battle_sprites, self.fonts['small'])
 
-        MonsterStatsSprite(monster_sprite.rect.midbottom + pygame.Vector2(0, 20), monster_sprite, (150, 48), self.battle_sprites, self.fonts['small'])
+        MonsterStatsSprite(monster_sprite.rect.midbottom + pygame.Vector2(0, 20), monster_sprite, (150, 48), self.battle_sprites, self.fonts['small'], self.engine.get_initiative)
+
+    def enter_monster(self, combatant: Combatant) -> None:
+        # the replacement only takes its slot once the fainted sprite is gone
+        self.engine.enter(combatant.side, combatant.pos_index)
 
     def input(self):
         if self.selection_mode and self.current_monster:
-            keys = pygame.key.get_just_pressed()
+            keys = get_just_pressed()
 
             match self.selection_mode:
                 case 'general': limiter = len(BATTLE_CHOICES['full'])
@@ -112,11 +121,9 @@ class Battle:
                 self.indexes[self.selection_mode] = (self.indexes[self.selection_mode] - 1) % limiter
             if keys[pygame.K_SPACE]:
                 if self.selection_mode == 'switch':
-                    index, new_monster = list(self.available_monsters.items())[self.indexes['switch']]
-                    self.current_monster.kill()
-                    self.create_monster(new_monster, index, self.current_monster.pos_index, 'player')
-                    self.selection_mode = None
-                    self.update_all_monsters('resume')
+                    index = self.switch_keys[self.indexes['switch']]
+                    self.engine.switch(self.current_monster.combatant, index)
+                    self.current_monster, self.selection_mode = None, None
 
                 if self.selection_mode == 'target':
                     sprite_group = self.opponent_sprites if self.selection_side == 'opponent' else self.player_sprites
@@ -124,15 +131,11 @@ class Battle:
                     monster_sprite = sprites[list(sprites.keys())[self.indexes['target']]]
 
                     if self.selected_attack:
-                        self.current_monster.activate_attack(monster_sprite, self.selected_attack)
+                        self.engine.attack(self.current_monster.combatant, monster_sprite.combatant, self.selected_attack)
                         self.selected_attack, self.current_monster, self.selection_mode = None, None, None
                     else:
-                        if monster_sprite.monster.health < monster_sprite.monster.get_stat('max_health') * 0.9:
-                            self.monster_data['player'][len(self.monster_data['player'])] = monster_sprite.monster
-                            monster_sprite.delayed_kill(None)
-                            self.update_all_monsters('resume')
-                        else:
-                            TimedSprite(monster_sprite.rect.center, self.monster_frames['ui']['cross'], self.battle_sprites, 1000)
+                        if self.engine.catch(self.current_monster.combatant, monster_sprite.combatant):
+                            self.current_monster, self.selection_mode = None, None
 
                 if self.selection_mode == 'attacks':
                     self.selection_mode = 'target'
@@ -144,13 +147,15 @@ class Battle:
                         self.selection_mode = 'attacks'
 
                     if self.indexes['general'] == 1:  # defense
-                        self.current_monster.monster.defending = True
-                        self.update_all_monsters('resume')
+                        self.engine.defend(self.current_monster.combatant)
                         self.current_monster, self.selection_mode = None, None
                         self.indexes['general'] = 0
 
                     if self.indexes['general'] == 2:  # switch
                         self.selection_mode = 'switch'
+                        # fixed while the turn waits for input, so not rebuilt every frame
+                        self.available_monsters = self.engine.get_available_monsters()
+                        self.switch_keys = list(self.available_monsters)
 
                     if self.indexes['general'] == 3:  # catch
                         self.selection_mode = 'target'
@@ -162,101 +167,64 @@ class Battle:
                 if self.selection_mode in ('attacks', 'switch', 'target'):
                     self.selection_mode = 'general'
  
-    def update_timers(self):
-        for timer in self.timers.values():
-            timer.update()
-
     # battle system
-    def check_active(self):
-        for monster_sprite in self.player_sprites.sprites() + self.opponent_sprites.sprites():
-            if monster_sprite.monster.initiative >= 100:
-                monster_sprite.monster.defending = False
-                self.update_all_monsters('pause')
-                monster_sprite.monster.initiative = 0
+    def handle_events(self):
+        for event in self.engine.poll_events():
+            self.handle_event(event)
+
+    def handle_event(self, event: BattleEvent):
+        monster_sprite = self.monster_sprites.get(event.combatant)
+        target_sprite = self.monster_sprites.get(event.target)
+
+        match event.kind:
+            case 'enter':
+                self.create_monster(event.combatant)
+            case 'turn':
                 monster_sprite.set_highlight(True)
                 self.current_monster = monster_sprite
-                if self.player_sprites in monster_sprite.groups():
+                if event.combatant.side == 'player':
                     self.selection_mode = 'general'
                 else:
                     self.timers['opponent delay'].activate()
-
-    def update_all_monsters(self, option: str):
-        for monster_sprite in self.player_sprites.sprites() + self.opponent_sprites.sprites():
-            monster_sprite.monster.paused = True if option == 'pause' else False
-
-    def apply_attack(self, target_sprite: MonsterSprite, attack: str, amount: int):
+            case 'attack':
+                monster_sprite.activate_attack(target_sprite, event.attack)
+            case 'switch':
+                monster_sprite.kill()
+                self.create_monster(event.target)
+            case 'faint':
+                monster_sprite.delayed_kill(event.target)
+            case 'caught':
+                target_sprite.delayed_kill(None)
+            case 'catch failed' if target_sprite:
+                TimedSprite(target_sprite.rect.center, self.monster_frames['ui']['cross'], self.battle_sprites, 1000)
+
+    def apply_attack(self, target_sprite: MonsterSprite, attack: str):
         attack_data = AttackData.get(attack)
 
         # play an animation
         AttackSprite(target_sprite.rect.center, self.monster_frames['attacks'][attack_data['animation']], self.battle_sprites)
         self.sounds[attack_data['animation']].play()
 
-        # get correct attack damage amount (defense, element)
-        attack_element = attack_data["element"]
-        target_element = target_sprite.monster.element
-
-        # double attack
-        if attack_element == 'fire' and target_element == 'plant' or\
-        attack_element == 'water' and target_element == 'fire' or \
-        attack_element == 'plant' and target_element == 'water':
-            amount *= 2
-
-        # halve attack
-        if attack_element == 'fire' and target_element == 'water' or\
-        attack_element == 'water' and target_element == 'plant' or\
-        attack_element == 'plant' and target_element == 'water':
-            amount *= 0.5
-
-        target_defense = 1 - target_sprite.monster.get_stat('defense') / 2000
-        if target_sprite.monster.defending:
-            target_defense -= 0.2
-        target_defense = max(0, min(1, target_defense))
-
-        # update the monster health
-        target_sprite.monster.health -= amount * target_defense
-        self.check_death()
-
-        # resume
-        self.update_all_monsters('resume')
-
-    def check_death(self):
-        for monster_sprite in self.opponent_sprites.sprites() + self.player_sprites.sprites():
-            if monster_sprite.monster.health <= 0:
-                if self.player_sprites in monster_sprite.groups():  # Player
-                    active_monsters = [(monster_sprite.index, monster_sprite.monster) for monster_sprite in self.player_sprites.sprites()]
-                    available_monsters = [(index, monster) for index, monster in self.monster_data['player'].items() if monster.health > 0 and (index, monster) not in active_monsters]
-                    if available_monsters:
-                        new_monster_data = [(monster, index, monster_sprite.pos_index, 'player') for index, monster in available_monsters][0]
-                    else:
-                        new_monster_data = None
-                else:
-                    new_monster_data = (list(self.monster_data['opponent'].values())[0], monster_sprite.index, monster_sprite.pos_index, 'opponent') if self.monster_data['opponent'] else None
-                    if self.monster_data['opponent']:
-                        del self.monster_data['opponent'][min(self.monster_data['opponent'])]
-                    
-                    # xp
-                    xp_amount = monster_sprite.monster.level * 100 / len(self.player_sprites)
-                    for player_sprite in self.player_sprites:
-                        player_sprite.monster.update_xp(xp_amount)
-
-                monster_sprite.delayed_kill(new_monster_data)
+        self.engine.resolve_attack()
 
     def opponent_attack(self):
-        ability = choice(self.current_monster.monster.get_abilities())
-        side = AttackData.get(ability)['target']
-        if side == 'player':
-            random_target = choice(self.opponent_sprites.sprites())
-        else:
-            random_target = choice(self.player_sprites.sprites())
-        self.current_monster.activate_attack(random_target, ability)
+        if self.engine.current is None or self.engine.current.side != 'opponent':
+            return
+        target, ability = self.engine.choose_attack(self.engine.current)
+        self.engine.attack(self.engine.current, target, ability)
+
+    def stop_timers(self) -> None:
+        # for when the battle is dropped, killing a sprite cancels its timers
+        for timer in self.timers.values():
+            timer.cancel()
+        for sprite in self.battle_sprites.sprites():
+            sprite.kill()
 
     def check_end_battle(self):
         # opponents have been defeated
         if len(self.opponent_sprites) == 0 and not self.battle_over:
             self.battle_over = True
             self.end_battle(self.character)
-            for monster in self.monster_data['player'].values():
-                monster.initiative = 0
 
         # player has been defeated
         if len(self.player_sprites) == 0:
@@ -278,7 +246,7 @@ class Battle:
             if index == self.indexes['general']:
                 surf: pygame.Surface = self.monster_frames['ui'][f"{data_dict['icon']}_highlight"]
             else:
-                surf: pygame.Surface = pygame.transform.grayscale(self.monster_frames['ui'][data_dict['icon']])
+                surf: pygame.Surface = grayscale(self.monster_frames['ui'][data_dict['icon']])
             rect = surf.get_frect(center = self.current_monster.rect.midright + data_dict['pos'])
             self.display_surface.blit(surf, rect)
 
@@ -304,7 +272,7 @@ class Battle:
             else:
                 text_color = COLORS['light']
                 
-            text_surf: pygame.Surface = self.fonts['regular'].render(ability, False, text_color)
+            text_surf: pygame.Surface = render_text(self.fonts['regular'], ability, False, text_color)
 
             # rect
             text_rect = text_surf.get_frect(center = bg_rect.midtop + pygame.Vector2(0, item_height / 2 + index * item_height + v_offset))
@@ -322,58 +290,72 @@ class Battle:
                 self.display_surface.blit(text_surf, text_rect)
 
     def draw_switch(self):
-        # data
-        width, height = 300, 320
-        visible_monsters = 4
-        item_height = height / visible_monsters
-        v_offset = 0 if self.indexes['switch'] < visible_monsters else -(self.indexes['switch'] - visible_monsters + 1) * item_height
-
         # rect
-        bg_rect = pygame.FRect((0, 0), (width, height)).move_to(midleft = self.current_monster.rect.midright + pygame.Vector2(20, 0))
+        bg_rect = pygame.FRect((0, 0), (self.switch_list.width, self.switch_list.item_height * self.switch_list.visible_items)).move_to(midleft = self.current_monster.rect.midright + pygame.Vector2(20, 0))
         pygame.draw.rect(self.display_surface, COLORS['white'], bg_rect, 0, 5)
 
-        # monsters
-        active_monsters = [(monster_sprite.index, monster_sprite.monster) for monster_sprite in self.player_sprites]
-        self.available_monsters = {index: monster for index, monster in self.monster_data['player'].items() if (index, monster) not in active_monsters and monster.health > 0}
+        # monsters, only the rows in view
+        self.switch_list.draw(self.display_surface, bg_rect.topleft, self.indexes['switch'], len(self.switch_keys), self.get_switch_row_key, self.render_switch_row)
+
+    def get_switch_monster(self, index: int) -> Monster:
+        return self.available_monsters[self.switch_keys[index]]
+
+    def get_switch_row_key(self, index: int) -> Tuple:
+        monster = self.get_switch_monster(index)
+        return (
+            monster.name, monster.level, index == self.indexes['switch'],
+            bar_state(100, monster.health, monster.get_stat('max_health')), bar_state(80, monster.energy, monster.get_stat('max_energy'))
+        )
+
+    def render_switch_row(self, index: int, surf: pygame.Surface, corner: Optional[str]) -> None:
+        monster = self.get_switch_monster(index)
+        selected = index == self.indexes['switch']
+        item_height = self.switch_list.item_height
+        item_bg_rect = pygame.FRect((0, 0), (self.switch_list.width, item_height))
+
+        # selection bg
+        if selected:
+            if corner == 'top':
+                pygame.draw.rect(surf, COLORS['dark white'], item_bg_rect, 0, 0, 5, 5)
+            elif corner == 'bottom':
+                pygame.draw.rect(surf, COLORS['dark white'], item_bg_rect, 0, 0, 0, 0, 5, 5)
+            else:
+                pygame.draw.rect(surf, COLORS['dark white'], item_bg_rect)
 
-        for index, monster in enumerate(self.available_monsters.values()):
-            selected = index == self.indexes['switch']
-            item_bg_rect = pygame.FRect((0, 0), (width, item_height)).move_to(midleft = (bg_rect.left, bg_rect.top + item_height / 2 + index * item_height + v_offset))
+        icon_surf: pygame.Surface = self.monster_frames['icons'][monster.name]
+        icon_rect = icon_surf.get_frect(midleft = (10, item_height / 2))
 
-            icon_surf: pygame.Surface = self.monster_frames['icons'][monster.name]
-            icon_rect = icon_surf.get_frect(midleft = bg_rect.topleft + pygame.Vector2(10, item_height / 2 + index * item_height + v_offset))
+        text_surf: pygame.Surface = render_text(self.fonts['regular'], f"{monster.name}({monster.level})", False, COLORS['red'] if selected else COLORS['black'])
+        text_rect = text_surf.get_frect(topleft = (90, icon_rect.top))
 
-            text_surf: pygame.Surface = self.fonts['regular'].render(f"{monster.name}({monster.level})", False, COLORS['red'] if selected else COLORS['black'])
-            text_rect = text_surf.get_frect(topleft = (bg_rect.left + 90, icon_rect.top))
+        for row_surf, rect in ((icon_surf, icon_rect), (text_surf, text_rect)):
+            surf.blit(row_surf, rect)
 
-            # selection bg
-            if selected:
-                if item_bg_rect.collidepoint(bg_rect.topleft):
-                    pygame.draw.rect(self.display_surface, COLORS['dark white'], item_bg_rect, 0, 0, 5, 5)
-                elif item_bg_rect.collidepoint(bg_rect.midbottom + pygame.Vector2(0, -1)):
-                    pygame.draw.rect(self.display_surface, COLORS['dark white'], item_bg_rect, 0, 0, 0, 0, 5, 5)
-                else:
-                    pygame.draw.rect(self.display_surface, COLORS['dark white'], item_bg_rect)
+        health_rect = pygame.FRect((text_rect.bottomleft + pygame.Vector2(0, 4)), (100, 4))
+        energy_rect = pygame.FRect((health_rect.bottomleft + pygame.Vector2(0, 2)), (80, 4))
+        draw_bar(surf, health_rect, monster.health, monster.get_stat('max_health'), COLORS['red'], COLORS['black'])
+        draw_bar(surf, energy_rect, monster.energy, monster.get_stat('max_energy'), COLORS['blue'], COLORS['black'])
 
-            if bg_rect.collidepoint(item_bg_rect.center):
-                for surf, rect in ((icon_surf, icon_rect), (text_surf, text_rect)):
-                    self.display_surface.blit(surf, rect)
-                
-                health_rect = pygame.FRect((text_rect.bottomleft + pygame.Vector2(0, 4)), (100, 4))
-                energy_rect = pygame.FRect((health_rect.bottomleft + pygame.Vector2(0, 2)), (80, 4))
-                draw_bar(self.display_surface, health_rect, monster.health, monster.get_stat('max_health'), COLORS['red'], COLORS['black'])
-                draw_bar(self.display_surface, energy_rect, monster.energy, monster.get_stat('max_energy'), COLORS['blue'], COLORS['black'])
+    def get_ui_state(self) -> Tuple:
+        return (self.current_monster, self.selection_mode, self.selection_side, self.selected_attack, tuple(self.indexes.values()))
+
+    def update_dirty_rects(self) -> None:
+        # the menus only change with the selection, so a change there repaints the whole screen
+        ui_state = self.get_ui_state()
+        if ui_state != self.ui_state:
+            self.ui_state = ui_state
+            self.dirty_rects = [self.display_surface.get_rect()]
+        else:
+            self.dirty_rects = self.battle_sprites.dirty_rects
 
-    def update(self, dt: float) -> None:
+    def simulate(self, dt: float) -> None:
         self.check_end_battle()
+        self.engine.tick(dt)
+        self.handle_events()
+        self.battle_sprites.update(dt)
 
-        # updates
-        self.input()
-        self.update_timers()
+    def draw(self) -> None:
         self.display_surface.blit(self.bg_surf, (0, 0))
-        self.check_active()
-
-        # drawing
-        self.battle_sprites.update(dt)
         self.battle_sprites.draw(self.current_monster, self.selection_side, self.selection_mode, self.indexes['target'], self.player_sprites, self.opponent_sprites)
         self.draw_ui()
+        self.update_dirty_rects()
@@ -0,0 +1,334 @@
+import random
+from heapq import heappush, heappop
+from math import ceil, inf
+from game_data import AttackData, ElementData
+from monster import Monster
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+SIDES = ('player', 'opponent')
+ACTIVE_SLOTS = 3
+
+
+class Combatant:
+    def __init__(self, monster: Monster, side: str, index: int, pos_index: int) -> None:
+        self.monster = monster
+        self.side = side
+        self.index = index          # key of the monster in its team
+        self.pos_index = pos_index  # battle slot it fights in
+
+        # battle clock time its initiative reaches 100 at the speed it was scheduled with
+        self.ready_at = inf
+        self.speed = 0.0
+        self.schedule_id = 0
+
+    def __repr__(self) -> str:
+        return f'Combatant: {self.monster.name}, {self.side} {self.pos_index}'
+
+
+class BattleEvent(NamedTuple):
+    kind: str
+    combatant: Optional[Combatant] = None
+    target: Optional[Combatant] = None
+    attack: Optional[str] = None
+    amount: float = 0
+    side: Optional[str] = None
+
+
+class BattleEngine:
+    """
+    Battle rules without any drawing or animation timing.
+
+    The caller advances time with tick, or jumps straight to the next turn with advance,
+    answers 'turn' events with one of the actions and reads what happened from poll_events.
+    An attack only lands on resolve_attack, so a view can play the attack animation first;
+    replacements for fainted monsters wait in pending until enter, unless auto_enter is set.
+
+    Initiative is not ticked per monster. Every monster on the field has the clock time it
+    reaches 100 in a heap, and the clock stops while a turn is in progress, which is when the
+    old per-monster pause applied to everyone at once.
+    """
+    def __init__(self, player_monsters: Dict[int, Monster], opponent_monsters: Dict[int, Monster], rng: Optional[random.Random] = None, auto_enter: bool = False) -> None:
+        self.teams = {'player': player_monsters, 'opponent': opponent_monsters}
+        self.rng = rng if rng is not None else random
+        self.auto_enter = auto_enter
+
+        # side -> pos_index -> combatant
+        self.active: Dict[str, Dict[int, Combatant]] = {side: {} for side in SIDES}
+        self.pending: Dict[str, Dict[int, Combatant]] = {side: {} for side in SIDES}
+
+        self.current: Optional[Combatant] = None
+        self.pending_attack: Optional[Tuple[Combatant, Combatant, str]] = None
+        self.winner: Optional[str] = None
+        self.events: List[BattleEvent] = []
+        self.turns = 0
+        self.elapsed = 0.0
+
+        # (ready_at, schedule_id, combatant), entries of rescheduled or removed combatants are skipped
+        self.clock = 0.0
+        self.schedule_queue: List[Tuple[float, int, Combatant]] = []
+        self.schedule_count = 0
+
+        self.setup()
+
+    def setup(self) -> None:
+        for side, monsters in self.teams.items():
+            for index, monster in {k: v for k, v in monsters.items() if k < ACTIVE_SLOTS}.items():
+                self.active[side][index] = Combatant(monster, side, index, index)
+                self.emit('enter', self.active[side][index])
+
+        # the opponents on the field are no longer reserves
+        for index in self.active['opponent']:
+            del self.teams['opponent'][index]
+
+        for monster in self.teams['player'].values():
+            monster.initiative = 0
+
+        for combatant in self.combatants():
+            self.schedule(combatant)
+
+    # state
+    def emit(self, kind: str, combatant: Optional[Combatant] = None, **data) -> None:
+        self.events.append(BattleEvent(kind, combatant, **data))
+
+    def poll_events(self) -> List[BattleEvent]:
+        events, self.events = self.events, []
+        return events
+
+    def combatants(self) -> Iterator[Combatant]:
+        for side in SIDES:
+            yield from list(self.active[side].values())
+
+    def is_active(self, combatant: Combatant) -> bool:
+        return self.active[combatant.side].get(combatant.pos_index) is combatant
+
+    def get_available_monsters(self) -> Dict[int, Monster]:
+        # replacements waiting to enter are spoken for too
+        taken = [combatant.monster for combatant in (*self.active['player'].values(), *self.pending['player'].values())]
+        return {index: monster for index, monster in self.teams['player'].items() if monster not in taken and monster.health > 0}
+
+    # scheduling
+    def schedule(self, combatant: Combatant) -> None:
+        combatant.speed = combatant.monster.get_stat('speed')
+        remaining = max(0, 100 - combatant.monster.initiative)
+        combatant.ready_at = self.clock + remaining / combatant.speed if combatant.speed > 0 else inf
+        self.schedule_count += 1
+        combatant.schedule_id = self.schedule_count
+        heappush(self.schedule_queue, (combatant.ready_at, combatant.schedule_id, combatant))
+
+    def unschedule(self, combatant: Combatant) -> None:
+        # keeps the initiative on the monster, a switched out monster carries on from there
+        self.sync_initiative(combatant)
+        combatant.schedule_id = 0
+
+    def reschedule(self, combatant: Combatant) -> None:
+        # after a level up changed the speed
+        self.sync_initiative(combatant)
+        self.schedule(combatant)
+
+    def get_initiative(self, combatant: Combatant) -> float:
+        """The initiative implied by the clock, for anything that displays it."""
+        if not combatant.schedule_id or combatant.ready_at == inf:
+            return combatant.monster.initiative
+        return 100 - (combatant.ready_at - self.clock) * combatant.speed
+
+    def sync_initiative(self, combatant: Combatant) -> None:
+        # written back only when the schedule entry is about to go
+        combatant.monster.initiative = self.get_initiative(combatant)
+
+    def get_next(self) -> Optional[Combatant]:
+        queue = self.schedule_queue
+        while queue:
+            ready_at, schedule_id, combatant = queue[0]
+            if schedule_id == combatant.schedule_id and ready_at != inf:
+                return combatant
+            heappop(queue)
+        return None
+
+    @property
+    def is_paused(self) -> bool:
+        return self.winner is not None or self.current is not None or self.pending_attack is not None
+
+    # time
+    def tick(self, dt: float) -> None:
+        if self.is_paused:
+            return
+
+        self.clock += dt
+        self.elapsed += dt
+        combatant = self.get_next()
+        if combatant and combatant.ready_at <= self.clock:
+            self.start_turn(combatant)
+
+    def advance(self, dt: Optional[float] = None) -> Optional[Combatant]:
+        """
+        Jumps the clock to the next turn and starts it, for auto-resolve and fast-forward.
+        With dt the jump is a whole number of ticks, so turns start on the same tick tick(dt) would start them.
+        """
+        if self.is_paused:
+            return None
+        combatant = self.get_next()
+        if combatant is None:
+            return None
+
+        wait = max(0, combatant.ready_at - self.clock)
+        if dt:
+            wait = max(1, ceil(wait / dt - 1e-9)) * dt
+        self.clock += wait
+        self.elapsed += wait
+        self.start_turn(combatant)
+        return combatant
+
+    def start_turn(self, combatant: Combatant) -> None:
+        combatant.monster.defending = False
+        combatant.monster.initiative = 0
+        self.schedule(combatant)
+        self.current = combatant
+        self.turns += 1
+        self.emit('turn', combatant)
+
+    def end_turn(self) -> None:
+        self.current = None
+
+    # actions
+    def attack(self, attacker: Combatant, target: Combatant, attack: str) -> None:
+        attacker.monster.reduce_energy(attack)
+        attacker.monster.stat_limiter()
+        self.current = None
+        self.pending_attack = (attacker, target, attack)
+        self.emit('attack', attacker, target = target, attack = attack)
+
+    def resolve_attack(self) -> None:
+        if self.pending_attack is None:
+            return
+        attacker, target, attack = self.pending_attack
+        self.pending_attack = None
+
+        amount = self.get_damage(attacker.monster, target.monster, attack)
+        target.monster.health -= amount
+        target.monster.stat_limiter()
+        self.emit('damage', attacker, target = target, attack = attack, amount = amount)
+        self.check_death()
+        self.end_turn()
+
+    def defend(self, combatant: Combatant) -> None:
+        combatant.monster.defending = True
+        self.emit('defend', combatant)
+        self.end_turn()
+
+    def switch(self, combatant: Combatant, index: int) -> Combatant:
+        new_combatant = Combatant(self.teams['player'][index], combatant.side, index, combatant.pos_index)
+        self.unschedule(combatant)
+        self.active[combatant.side][combatant.pos_index] = new_combatant
+        self.schedule(new_combatant)
+        self.emit('switch', combatant, target = new_combatant)
+        self.end_turn()
+        return new_combatant
+
+    def catch(self, combatant: Combatant, target: Combatant) -> bool:
+        if not self.is_active(target) or target.monster.health >= target.monster.get_stat('max_health') * 0.9:
+            self.emit('catch failed', combatant, target = target)
+            return False
+
+        player_team = self.teams['player']
+        player_team[len(player_team)] = target.monster
+        self.unschedule(target)
+        del self.active[target.side][target.pos_index]
+        self.emit('caught', combatant, target = target)
+        self.end_turn()
+        self.check_winner()
+        return True
+
+    def choose_attack(self, combatant: Combatant) -> Tuple[Combatant, str]:
+        # the opponent ai, a random ability on a random target
+        ability = self.rng.choice(combatant.monster.get_abilities())
+        # 'player' attacks target the user's own side
+        own_side = AttackData.get(ability)['target'] == 'player'
+        side = combatant.side if own_side else SIDES[1 - SIDES.index(combatant.side)]
+        return self.rng.choice(list(self.active[side].values())), ability
+
+    # rules
+    def get_damage(self, attacker: Monster, target: Monster, attack: str) -> float:
+        attack_data = AttackData.get(attack)
+        amount = attacker.get_base_damage(attack)
+
+        # get correct attack damage amount (defense, element)
+        amount *= ElementData.get_multiplier(attack_data['element_id'], target.element_id)
+
+        target_defense = 1 - target.get_stat('defense') / 2000
+        if target.defending:
+            target_defense -= 0.2
+        target_defense = max(0, min(1, target_defense))
+
+        return amount * target_defense
+
+    def get_replacement(self, combatant: Combatant) -> Optional[Combatant]:
+        if combatant.side == 'player':
+            available_monsters = self.get_available_monsters()
+            if not available_monsters:
+                return None
+            index = next(iter(available_monsters))
+            return Combatant(available_monsters[index], 'player', index, combatant.pos_index)
+
+        reserves = self.teams['opponent']
+        if not reserves:
+            return None
+        index = min(reserves)
+        return Combatant(reserves.pop(index), 'opponent', combatant.index, combatant.pos_index)
+
+    def check_death(self) -> None:
+        for side in ('opponent', 'player'):
+            for combatant in list(self.active[side].values()):
+                if combatant.monster.health > 0:
+                    continue
+
+                if side == 'opponent':
+                    # xp
+                    player_combatants = self.active['player'].values()
+                    xp_amount = combatant.monster.level * 100 / max(1, len(player_combatants))
+                    for player_combatant in player_combatants:
+                        player_combatant.monster.update_xp(xp_amount)
+                        if player_combatant.monster.get_stat('speed') != player_combatant.speed:
+                            self.reschedule(player_combatant)
+
+                self.unschedule(combatant)
+                del self.active[side][combatant.pos_index]
+                replacement = self.get_replacement(combatant)
+                if replacement:
+                    self.pending[side][combatant.pos_index] = replacement
+                self.emit('faint', combatant, target = replacement)
+
+                if replacement and self.auto_enter:
+                    self.enter(side, combatant.pos_index)
+
+        self.check_winner()
+
+    def enter(self, side: str, pos_index: int) -> Optional[Combatant]:
+        combatant = self.pending[side].pop(pos_index, None)
+        if combatant:
+            self.active[side][pos_index] = combatant
+            self.schedule(combatant)
+            self.emit('enter', combatant)
+        return combatant
+
+    def check_winner(self) -> None:
+        for side, other_side in (('opponent', 'player'), ('player', 'opponent')):
+            if not self.winner and not self.active[side] and not self.pending[side]:
+                self.winner = other_side
+                for monster in self.teams['player'].values():
+                    monster.initiative = 0
+                self.emit('battle over', side = other_side)
+
+
+def simulate(engine: BattleEngine, dt: Optional[float] = 0.05, max_turns: int = 10000) -> Optional[str]:
+    """
+    Plays a battle out with the opponent ai on both sides, returns the winning side or None on timeout.
+    Turns start on tick boundaries of dt like in the game, or at the exact time without it.
+    """
+    for _ in range(max_turns):
+        if engine.winner or not engine.advance(dt):
+            break
+        target, ability = engine.choose_attack(engine.current)
+        engine.attack(engine.current, target, ability)
+        engine.resolve_attack()
+        engine.events.clear()
+    return engine.winner
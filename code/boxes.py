@@ -0,0 +1,166 @@
+import pygame
+from monster import Monster
+from settings import *
+from storage import MonsterStorage
+from typing import Dict, List, Optional, Tuple
+from text_cache import render_text
+from save_ import Save
+from virtual_list import VirtualList
+from controls import get_just_pressed
+
+
+class Boxes:
+    """
+    The storage boxes, one box at a time. Left and right change the box, space lists the
+    strongest stored monsters of the selected monster's element instead, and return moves
+    the selected monster into the team while it has room.
+    """
+    def __init__(self, monsters: Dict[int, Monster], storage: MonsterStorage, fonts: Dict[str, pygame.font.Font], monster_frames: Dict[str, Dict[str, pygame.Surface]]) -> None:
+        self.display_surface = pygame.display.get_surface()
+        self.monsters = monsters
+        self.storage = storage
+        self.fonts = fonts
+        self.frame_index = 0
+
+        # frames
+        self.icon_frames = monster_frames['icons']
+        self.monster_frames = monster_frames['monsters']
+
+        self.tint_surf = pygame.Surface((self.display_surface.get_width(), self.display_surface.get_height()))
+        self.tint_surf.set_alpha(200)
+
+        # dimensions
+        self.main_rect = pygame.FRect(
+            0, 0,
+            WINDOW_WIDTH * 0.6, WINDOW_HEIGHT * 0.8
+        ).move_to(center = (WINDOW_WIDTH / 2, WINDOW_HEIGHT / 2))
+
+        # list
+        self.visible_items = 6
+        self.list_width = self.main_rect.width * 0.4
+        self.item_height = self.main_rect.height / self.visible_items
+        self.index = 0
+        self.list = VirtualList(self.list_width, self.item_height, self.visible_items, anchor = int(self.visible_items * 0.5))
+
+        # box number, or the element the list is filtered by
+        self.box = 0
+        self.element: Optional[str] = None
+        self.filtered: List[Tuple[int, Monster]] = []
+
+    def get_rows(self) -> List[Tuple[int, Monster]]:
+        return self.filtered if self.element else self.storage.get_box(self.box)
+
+    def filter(self, element: Optional[str]) -> None:
+        self.element = element
+        rows = self.storage.find(element = element, limit = STORAGE_BOX_SIZE) if element else []
+        self.filtered = [(row.id, self.storage.create_monster(row)) for row in rows]
+        self.index = 0
+
+    def withdraw(self, id: int) -> None:
+        self.monsters[len(self.monsters)] = self.storage.withdraw(id)
+        # like a deposit, the team in the save file has to follow the storage change
+        save = Save()
+        save.mark_dirty('team', 'storage')
+        save.save()
+        if self.element:
+            self.filter(self.element)
+
+    def input(self) -> None:
+        keys = get_just_pressed()
+        rows = self.get_rows()
+        if keys[pygame.K_UP]:
+            self.index -= 1
+        if keys[pygame.K_DOWN]:
+            self.index += 1
+        if not self.element and (keys[pygame.K_LEFT] or keys[pygame.K_RIGHT]):
+            self.box = (self.box + (1 if keys[pygame.K_RIGHT] else -1)) % max(1, self.storage.get_box_count())
+            self.index = 0
+            rows = self.get_rows()
+        if keys[pygame.K_SPACE] and (rows or self.element):
+            self.filter(None if self.element else rows[self.index % len(rows)][1].element)
+            rows = self.get_rows()
+        if keys[pygame.K_RETURN] and rows and len(self.monsters) < MAX_TEAM_SIZE:
+            self.withdraw(rows[self.index % len(rows)][0])
+            rows = self.get_rows()
+
+        self.index = self.index % len(rows) if rows else 0
+
+    def display_list(self, rows: List[Tuple[int, Monster]]) -> None:
+        bg_rect = pygame.FRect(self.main_rect.topleft, (self.list_width, self.main_rect.height))
+        pygame.draw.rect(self.display_surface, COLORS['gray'], bg_rect, 0, 0, 12, 0, 12, 0)
+
+        # a box is small, but the filtered list can be a whole box long too
+        self.list.draw(self.display_surface, self.main_rect.topleft, self.index, len(rows), lambda index: (rows[index][0], self.index == index), lambda index, surf, corner: self.render_row(rows[index][1], index, surf, corner))
+
+        # lines
+        for i in range(1, min(self.visible_items, len(rows))):
+            y = self.main_rect.top + self.item_height * i
+            left = self.main_rect.left
+            right = self.main_rect.left + self.list_width
+            pygame.draw.line(self.display_surface, COLORS['light-gray'], (left, y), (right, y))
+
+        # shadow
+        shadow_surf = pygame.Surface((4, self.main_rect.height))
+        shadow_surf.set_alpha(100)
+        self.display_surface.blit(shadow_surf, (self.main_rect.left + self.list_width - 4, self.main_rect.top))
+
+    def render_row(self, monster: Monster, index: int, surf: pygame.Surface, corner: Optional[str]) -> None:
+        bg_color = COLORS['gray'] if self.index != index else COLORS['light']
+        item_rect = pygame.FRect((0, 0), (self.list_width, self.item_height))
+
+        if corner == 'top':
+            pygame.draw.rect(surf, bg_color, item_rect, 0, 0, 12)
+        elif corner == 'bottom':
+            pygame.draw.rect(surf, bg_color, item_rect, 0, 0, 0, 0, 12, 0)
+        else:
+            pygame.draw.rect(surf, bg_color, item_rect)
+
+        text_surf = render_text(self.fonts['regular'], f"{monster.name} Lvl {monster.level}", False, COLORS['white'])
+        surf.blit(text_surf, text_surf.get_frect(midleft = item_rect.midleft + pygame.Vector2(90, 0)))
+        icon_surf = self.icon_frames[monster.name]
+        surf.blit(icon_surf, icon_surf.get_frect(center = item_rect.midleft + pygame.Vector2(45, 0)))
+
+    def display_main(self, rows: List[Tuple[int, Monster]]) -> None:
+        # main bg
+        rect = pygame.FRect(self.main_rect.left + self.list_width, self.main_rect.top, self.main_rect.width - self.list_width, self.main_rect.height)
+        pygame.draw.rect(self.display_surface, COLORS['dark'], rect, 0, 12, 0, 12, 0)
+
+        # title
+        title = f"Best {self.element}" if self.element else f"Box {self.box + 1} / {max(1, self.storage.get_box_count())}"
+        title_surf = render_text(self.fonts['bold'], title, False, COLORS['white'])
+        self.display_surface.blit(title_surf, title_surf.get_frect(midbottom = rect.midbottom + pygame.Vector2(0, -20)))
+
+        if not rows:
+            return
+        monster = rows[self.index % len(rows)][1]
+
+        # monster display
+        top_rect = pygame.FRect(rect.topleft, (rect.width, rect.height * 0.6))
+        pygame.draw.rect(self.display_surface, COLORS[monster.element], top_rect, 0, 0, 0, 12)
+
+        monster_animation = self.monster_frames[monster.name]['idle']
+        monster_surf = monster_animation[int(self.frame_index) % len(monster_animation)]
+        self.display_surface.blit(monster_surf, monster_surf.get_frect(center = top_rect.center))
+
+        name_surf = render_text(self.fonts['bold'], monster.name, False, COLORS['white'])
+        self.display_surface.blit(name_surf, name_surf.get_frect(topleft = top_rect.topleft + pygame.Vector2(10, 10)))
+
+        level_surf = render_text(self.fonts['regular'], f'Lvl: {monster.level}', False, COLORS['white'])
+        self.display_surface.blit(level_surf, level_surf.get_frect(bottomleft = top_rect.bottomleft + pygame.Vector2(10, -10)))
+
+        element_surf = render_text(self.fonts['regular'], monster.element, False, COLORS['white'])
+        self.display_surface.blit(element_surf, element_surf.get_frect(bottomright = top_rect.bottomright + pygame.Vector2(-10, -10)))
+
+        # what return does
+        hint = "Return: take into team" if len(self.monsters) < MAX_TEAM_SIZE else "Team is full"
+        hint_surf = render_text(self.fonts['regular'], hint, False, COLORS['white'])
+        self.display_surface.blit(hint_surf, hint_surf.get_frect(midtop = top_rect.midbottom + pygame.Vector2(0, 20)))
+
+    def simulate(self, dt: float) -> None:
+        self.frame_index += ANIMATION_SPEED * dt
+
+    def draw(self) -> None:
+        rows = self.get_rows()
+        self.display_surface.blit(self.tint_surf, (0, 0))
+        self.display_list(rows)
+        self.display_main(rows)
@@ -0,0 +1,31 @@
+import os
+import zlib
+import pickle
+import hashlib
+from typing import Any, Optional
+
+# magic, format version byte and the sha1 fingerprint of the sources, then a compressed pickle
+FINGERPRINT_SIZE = hashlib.sha1().digest_size
+
+
+def write_bundle(path: str, magic: bytes, version: int, source_fingerprint: bytes, data: Any) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    # written next to the old file and swapped in, so a crash never leaves half a bundle behind
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(magic + bytes([version]) + source_fingerprint)
+        f.write(zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+    os.replace(temp_path, path)
+
+def read_bundle(path: str, magic: bytes, version: int, expected_fingerprint: Optional[bytes]) -> Optional[Any]:
+    """The pickled data, or None when the file is missing, damaged, another format or built from other sources."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(len(magic) + 1 + FINGERPRINT_SIZE)
+            if header[:len(magic)] != magic or header[len(magic)] != version:
+                return None
+            if expected_fingerprint is not None and header[len(magic) + 1:] != expected_fingerprint:
+                return None
+            return pickle.loads(zlib.decompress(f.read()))
+    except (OSError, IndexError, zlib.error, pickle.UnpicklingError):
+        return None
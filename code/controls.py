@@ -0,0 +1,51 @@
+import pygame
+from singleton import SingletonMeta
+from typing import Optional, Tuple
+
+# every key the game reads, recordings store each one as a bit
+KEYS = (pygame.K_UP, pygame.K_DOWN, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE, pygame.K_RETURN, pygame.K_ESCAPE)
+KEY_BITS = {key: 1 << index for index, key in enumerate(KEYS)}
+
+
+class KeyState:
+    __slots__ = ('mask',)
+
+    def __init__(self, mask: int) -> None:
+        self.mask = mask
+
+    def __getitem__(self, key: int) -> bool:
+        return bool(self.mask & KEY_BITS.get(key, 0))
+
+
+def get_mask(keys) -> int:
+    return sum(bit for key, bit in KEY_BITS.items() if keys[key])
+
+
+class Controls(metaclass=SingletonMeta):
+    """
+    Where the game reads the keyboard from. Straight from pygame unless a recording or replay
+    sets the state of the current tick, then every read in the tick sees the same keys.
+    """
+    def __init__(self) -> None:
+        self.pressed: Optional[KeyState] = None
+        self.just_pressed: Optional[KeyState] = None
+
+    def sample(self) -> Tuple[int, int]:
+        return get_mask(pygame.key.get_pressed()), get_mask(pygame.key.get_just_pressed())
+
+    def set_state(self, pressed: int, just_pressed: int) -> None:
+        self.pressed = KeyState(pressed)
+        self.just_pressed = KeyState(just_pressed)
+
+    def get_pressed(self):
+        return self.pressed if self.pressed is not None else pygame.key.get_pressed()
+
+    def get_just_pressed(self):
+        return self.just_pressed if self.just_pressed is not None else pygame.key.get_just_pressed()
+
+
+def get_pressed():
+    return Controls().get_pressed()
+
+def get_just_pressed():
+    return Controls().get_just_pressed()
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import hashlib
+from bundle_file import read_bundle, write_bundle
+from support import get_path
+from typing import Any, Dict, List, Optional, Tuple
+
+COMPILER_VERSION = 1
+MAGIC = b'PMDATA'
+BUNDLE_PATH = ("data", "compiled", "game_data.bundle")
+
+# bundle section -> source folder, one json file per id
+SOURCES: Dict[str, Tuple[str, ...]] = {
+    'monsters': ("data", "monsters"),
+    'attacks': ("data", "attacks"),
+    'trainers': ("data", "trainers"),
+}
+
+Bundle = Dict[str, Dict[str, dict]]
+
+NUMBER = (int, float)
+OPTIONAL_STR = (str, type(None))
+OPTIONAL_LIST = (list, type(None))
+
+# field -> allowed types, fields in OPTIONAL_FIELDS may be left out
+SCHEMAS: Dict[str, Dict[str, Any]] = {
+    'monsters': {'name': str, 'number': int, 'stats': dict, 'abilities': dict, 'evolve': OPTIONAL_LIST},
+    'attacks': {'name': str, 'target': str, 'amount': NUMBER, 'cost': int, 'element': str, 'animation': str},
+    'trainers': {'id': str, 'dialog': dict, 'directions': list, 'look_around': bool, 'defeated': bool, 'biome': OPTIONAL_STR, 'monsters': dict, 'direction': str, 'radius': NUMBER},
+}
+OPTIONAL_FIELDS = {'trainers': {'monsters', 'direction', 'radius'}}
+STAT_FIELDS = {'element': str, 'max_health': NUMBER, 'max_energy': NUMBER, 'attack': NUMBER, 'defense': NUMBER, 'recovery': NUMBER, 'speed': NUMBER}
+ATTACK_TARGETS = ('player', 'opponent')
+
+_bundle: Optional[Bundle] = None
+
+
+class DataError(ValueError):
+    pass
+
+
+# region compile
+
+def get_source_files() -> Dict[str, List[str]]:
+    return {
+        section: sorted(name for name in os.listdir(get_path(*folder)) if name.lower().endswith('.json'))
+        for section, folder in SOURCES.items()
+    }
+
+def fingerprint(source_files: Dict[str, List[str]]) -> bytes:
+    # sizes and modification times only, checking for a stale bundle should not read every source
+    digest = hashlib.sha1(str(COMPILER_VERSION).encode())
+    for section, file_names in source_files.items():
+        for file_name in file_names:
+            stat = os.stat(get_path(*SOURCES[section], file_name))
+            digest.update(f"{section}/{file_name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.digest()
+
+def check_fields(errors: List[str], where: str, data: Any, schema: Dict[str, Any], optional = ()) -> None:
+    if not isinstance(data, dict):
+        errors.append(f"{where}: expected an object")
+        return
+    for field, types in schema.items():
+        if field not in data:
+            if field not in optional:
+                errors.append(f"{where}: missing '{field}'")
+        elif not isinstance(data[field], types):
+            errors.append(f"{where}: '{field}' has the wrong type {type(data[field]).__name__}")
+    for field in data:
+        if field not in schema:
+            errors.append(f"{where}: unknown field '{field}'")
+
+def is_monster_entry(entry: Any) -> bool:
+    return isinstance(entry, list) and len(entry) == 2 and isinstance(entry[0], str) and isinstance(entry[1], int)
+
+def validate(bundle: Bundle) -> None:
+    """Checks every record against its schema and every cross reference, raises one DataError listing all problems."""
+    errors: List[str] = []
+    for section, records in bundle.items():
+        for id, data in records.items():
+            check_fields(errors, f"{section}/{id}", data, SCHEMAS[section], OPTIONAL_FIELDS.get(section, ()))
+
+    monster_names = {data.get('name') for data in bundle['monsters'].values()}
+    for id, data in bundle['monsters'].items():
+        where = f"monsters/{id}"
+        if isinstance(data.get('stats'), dict):
+            check_fields(errors, f"{where} stats", data['stats'], STAT_FIELDS)
+        for level, ability in data.get('abilities', {}).items():
+            if not level.isdigit():
+                errors.append(f"{where}: ability level '{level}' is not a number")
+            if ability not in bundle['attacks']:
+                errors.append(f"{where}: unknown ability '{ability}'")
+        evolve = data.get('evolve')
+        if evolve is not None and not (is_monster_entry(evolve) and evolve[0] in monster_names):
+            errors.append(f"{where}: evolve should be [known monster, level], not {evolve}")
+
+    for id, data in bundle['attacks'].items():
+        if data.get('target') not in ATTACK_TARGETS:
+            errors.append(f"attacks/{id}: target should be one of {ATTACK_TARGETS}")
+
+    for id, data in bundle['trainers'].items():
+        where = f"trainers/{id}"
+        for entry in data.get('monsters', {}).values():
+            if not (is_monster_entry(entry) and entry[0] in monster_names):
+                errors.append(f"{where}: team entry should be [known monster, level], not {entry}")
+        if isinstance(data.get('dialog'), dict) and 'default' not in data['dialog']:
+            errors.append(f"{where}: dialog needs a 'default' entry")
+
+    if errors:
+        raise DataError("invalid game data:\n  " + "\n  ".join(errors))
+
+def compile_bundle(source_files: Dict[str, List[str]]) -> Bundle:
+    bundle: Bundle = {}
+    for section, file_names in source_files.items():
+        bundle[section] = {}
+        for file_name in file_names:
+            path = get_path(*SOURCES[section], file_name)
+            with open(path, "r", encoding = "utf-8") as f:
+                try:
+                    bundle[section][file_name.split('.')[0]] = json.load(f)
+                except json.JSONDecodeError as e:
+                    raise DataError(f"{section}/{file_name}: {e}")
+    validate(bundle)
+    return bundle
+
+def build() -> Bundle:
+    source_files = get_source_files()
+    bundle = compile_bundle(source_files)
+    write_bundle(get_path(*BUNDLE_PATH), MAGIC, COMPILER_VERSION, fingerprint(source_files), bundle)
+    return bundle
+
+# endregion
+
+# region runtime
+
+def load_bundle() -> Bundle:
+    """The whole game data in one read, rebuilt first when the json sources next to it changed."""
+    global _bundle
+    if _bundle is not None:
+        return _bundle
+
+    # a packaged game may ship the bundle without the sources
+    has_sources = all(os.path.isdir(get_path(*folder)) for folder in SOURCES.values())
+    source_files = get_source_files() if has_sources else None
+    source_fingerprint = fingerprint(source_files) if source_files else None
+
+    bundle = read_bundle(get_path(*BUNDLE_PATH), MAGIC, COMPILER_VERSION, source_fingerprint)
+    if bundle is None:
+        if source_files is None:
+            raise FileNotFoundError("No game data sources or compiled bundle")
+        bundle = compile_bundle(source_files)
+        try:
+            write_bundle(get_path(*BUNDLE_PATH), MAGIC, COMPILER_VERSION, source_fingerprint, bundle)
+        except OSError:
+            pass  # read-only install, compile again next launch
+
+    _bundle = bundle
+    return bundle
+
+# endregion
+
+
+if __name__ == "__main__":
+    try:
+        bundle = build()
+    except DataError as e:
+        sys.exit(str(e))
+    print(", ".join(f"{len(records)} {section}" for section, records in bundle.items()) + f" -> {get_path(*BUNDLE_PATH)}")
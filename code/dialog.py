@@ -4,6 +4,7 @@ from entities import Character, Player
 from types_utils import GroupsArgument
 from timer_ import Timer
 from typing import Callable
+from controls import get_just_pressed
 
 
 class DialogTree:
@@ -22,7 +23,7 @@ class DialogTree:
         self.dialog_timer = Timer(500, autostart = True)
 
     def input(self) -> None:
-        keys = pygame.key.get_just_pressed()
+        keys = get_just_pressed()
         if keys[pygame.K_SPACE] and not self.dialog_timer.active:
             self.current_dialog.kill()
             self.dialog_index += 1
@@ -33,7 +34,6 @@ class DialogTree:
                 self.end_dialog(self.character)
 
     def update(self) -> None:
-        self.dialog_timer.update()
         self.input()
 
     
@@ -3,7 +3,13 @@ from game_data import MonsterData
 from save_ import Save
 from support import format_with_leading_zeros
 from settings import *
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional, Tuple
+from text_cache import render_text
+from virtual_list import VirtualList
+from controls import get_just_pressed
+
+# a monster only moves up this list
+STATUSES = ('unknown', 'view', 'catch')
 
 
 class Encyclopedia:
@@ -31,8 +37,10 @@ class Encyclopedia:
         self.list_width = self.main_rect.width * 0.4
         self.item_height = self.main_rect.height / self.visible_items
         self.index = 0
+        # the selection scrolls the list once it is past the middle
+        self.list = VirtualList(self.list_width, self.item_height, self.visible_items, anchor = int(self.visible_items * 0.5))
 
-        monsters_data = MonsterData.all()
+        monsters_data = MonsterData.get_dex()
         save = Save()
         available_monsters: List[Dict[str, str]] = save.get("encyclopedia")
 
@@ -50,11 +58,23 @@ class Encyclopedia:
                 "status": status,
                 "data": monster_data
             })
+        self.monsters_by_name = {monster["monster"]: monster for monster in self.monsters_list}
+
+    def discover(self, names: Iterable[str], status: str) -> None:
+        changed = False
+        for name in names:
+            monster = self.monsters_by_name.get(name.lower())
+            if monster and STATUSES.index(status) > STATUSES.index(monster["status"]):
+                monster["status"] = status
+                changed = True
+        if changed:
+            Save().mark_dirty('encyclopedia')
 
-        self.monsters_list.sort(key=lambda m: m["data"].get("number", 9999))
+    def get_save_data(self) -> List[Dict[str, str]]:
+        return [{"monster": monster["monster"], "status": monster["status"]} for monster in self.monsters_list if monster["status"] != "unknown"]
 
     def input(self) -> None:
-        keys = pygame.key.get_just_pressed()
+        keys = get_just_pressed()
         if keys[pygame.K_UP]:
             self.index -= 1
         if keys[pygame.K_DOWN]:
@@ -66,40 +86,8 @@ class Encyclopedia:
         bg_rect = pygame.FRect(self.main_rect.topleft, (self.list_width, self.main_rect.height))
         pygame.draw.rect(self.display_surface, COLORS['gray'], bg_rect, 0, 0, 12, 0, 12, 0)
 
-        half_visible_items = self.visible_items * 0.5 + 1
-        v_offset = 0 if self.index < half_visible_items else -(self.index - half_visible_items + 1) * self.item_height
-        for index, monster in enumerate(self.monsters_list):
-            # colors
-            bg_color = COLORS['gray'] if self.index != index else COLORS['light']
-            text_color = COLORS['white']
-
-            top = self.main_rect.top + index * self.item_height + v_offset
-            item_rect = pygame.FRect(self.main_rect.left, top, self.list_width, self.item_height)
-
-            if monster["status"] == "unknown":
-                text_surf = self.fonts['regular'].render(f"{format_with_leading_zeros(monster['data']['number'])} # " + "?" * len(monster["monster"]), False, text_color)
-                text_rect = text_surf.get_frect(midleft = item_rect.midleft + pygame.Vector2(90, 0))
- 
-                icon_surf = self.ui_frames['cross']
-                icon_rect = icon_surf.get_frect(center = item_rect.midleft + pygame.Vector2(45, 0))
-            else:
-                text_surf = self.fonts['regular'].render(f"{format_with_leading_zeros(monster['data']['number'])} # {monster['data']['name']}", False, text_color)
-                text_rect = text_surf.get_frect(midleft = item_rect.midleft + pygame.Vector2(90, 0))
-
-                icon_surf = self.icon_frames[monster["data"]["name"]]
-                icon_rect = icon_surf.get_frect(center = item_rect.midleft + pygame.Vector2(45, 0))
-
-            if item_rect.colliderect(self.main_rect):
-                # check corners
-                if item_rect.collidepoint(self.main_rect.topleft):
-                    pygame.draw.rect(self.display_surface, bg_color, item_rect, 0, 0, 12)
-                elif item_rect.collidepoint(self.main_rect.bottomleft + pygame.Vector2(1, -1)):
-                    pygame.draw.rect(self.display_surface, bg_color, item_rect, 0, 0, 0, 0, 12, 0)
-                else:
-                    pygame.draw.rect(self.display_surface, bg_color, item_rect)
-
-                self.display_surface.blit(text_surf, text_rect)
-                self.display_surface.blit(icon_surf, icon_rect)
+        # only the rows in view, the whole dex is in the list
+        self.list.draw(self.display_surface, self.main_rect.topleft, self.index, len(self.monsters_list), self.get_row_key, self.render_row)
 
         # lines
         for i in range(1, min(self.visible_items, len(self.monsters_list))):
@@ -113,7 +101,33 @@ class Encyclopedia:
         shadow_surf.set_alpha(100)
         self.display_surface.blit(shadow_surf, (self.main_rect.left + self.list_width - 4, self.main_rect.top))
 
-    def display_main(self, dt: float):
+    def get_row_key(self, index: int) -> Tuple[str, str, bool]:
+        monster = self.monsters_list[index]
+        return (monster["monster"], monster["status"], self.index == index)
+
+    def render_row(self, index: int, surf: pygame.Surface, corner: Optional[str]) -> None:
+        monster = self.monsters_list[index]
+        bg_color = COLORS['gray'] if self.index != index else COLORS['light']
+        text_color = COLORS['white']
+        item_rect = pygame.FRect((0, 0), (self.list_width, self.item_height))
+
+        if corner == 'top':
+            pygame.draw.rect(surf, bg_color, item_rect, 0, 0, 12)
+        elif corner == 'bottom':
+            pygame.draw.rect(surf, bg_color, item_rect, 0, 0, 0, 0, 12, 0)
+        else:
+            pygame.draw.rect(surf, bg_color, item_rect)
+
+        if monster["status"] == "unknown":
+            text_surf = render_text(self.fonts['regular'], f"{format_with_leading_zeros(monster['data']['number'])} # " + "?" * len(monster["monster"]), False, text_color)
+            icon_surf = self.ui_frames['cross']
+        else:
+            text_surf = render_text(self.fonts['regular'], f"{format_with_leading_zeros(monster['data']['number'])} # {monster['data']['name']}", False, text_color)
+            icon_surf = self.icon_frames[monster["data"]["name"]]
+        surf.blit(text_surf, text_surf.get_frect(midleft = item_rect.midleft + pygame.Vector2(90, 0)))
+        surf.blit(icon_surf, icon_surf.get_frect(center = item_rect.midleft + pygame.Vector2(45, 0)))
+
+    def display_main(self):
         # data
         monster = self.monsters_list[self.index]
 
@@ -129,24 +143,25 @@ class Encyclopedia:
         pygame.draw.rect(self.display_surface, COLORS[monster["data"]["stats"]["element"]], top_rect, 0, 0, 0, 12)
 
         # monster animation
-        self.frame_index += ANIMATION_SPEED * dt
         monster_animation = self.monster_frames[monster["data"]["name"]]["idle"]
         monster_surf: pygame.Surface = monster_animation[int(self.frame_index) % len(monster_animation)]
         monster_rect: pygame.FRect = monster_surf.get_frect(center = top_rect.center)
         self.display_surface.blit(monster_surf, monster_rect)
 
         # name
-        name_surf = self.fonts['bold'].render(f"{format_with_leading_zeros(monster['data']['number'])} # {monster['data']['name']}", False, COLORS['white'])
+        name_surf = render_text(self.fonts['bold'], f"{format_with_leading_zeros(monster['data']['number'])} # {monster['data']['name']}", False, COLORS['white'])
         name_rect = name_surf.get_frect(topleft = top_rect.topleft + pygame.Vector2(10, 10))
         self.display_surface.blit(name_surf, name_rect)
 
         # element
-        element_surf = self.fonts['regular'].render(monster["data"]["stats"]["element"], False, COLORS['white'])
+        element_surf = render_text(self.fonts['regular'], monster["data"]["stats"]["element"], False, COLORS['white'])
         element_rect = element_surf.get_frect(bottomright = top_rect.bottomright + pygame.Vector2(-10, -10))
         self.display_surface.blit(element_surf, element_rect)
 
-    def update(self, dt: float):
-        self.input()
+    def simulate(self, dt: float):
+        self.frame_index += ANIMATION_SPEED * dt
+
+    def draw(self):
         self.display_surface.blit(self.tint_surf, (0, 0))
         self.display_list()
-        self.display_main(dt)
+        self.display_main()
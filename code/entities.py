@@ -3,9 +3,13 @@ from settings import *
 from types_utils import GroupsArgument
 from support import check_connections
 from monster import Monster
-from typing import Tuple, List, Dict, Callable, Any
+from typing import TYPE_CHECKING, Tuple, List, Dict, Callable, Any
 from timer_ import Timer
-from random import choice
+from rng import get_stream
+from controls import get_pressed
+
+if TYPE_CHECKING:
+    from groups import CollisionSprites
 
 
 class Entity(pygame.sprite.Sprite):
@@ -27,6 +31,8 @@ class Entity(pygame.sprite.Sprite):
         self.image = self.frames[self.get_state()][self.frame_index]
         self.rect = self.image.get_frect(center = pos)
         self.hitbox = self.rect.inflate(-self.rect.width / 2, -60)
+        # topleft before the last update, drawing interpolates from it in fixed timestep mode
+        self.previous_pos = pygame.Vector2(self.rect.topleft)
 
         self.y_sort = self.rect.centery
 
@@ -89,7 +95,7 @@ class Character(Entity):
 
     def random_view_direction(self) -> None:
         if self.can_rotate:
-            self.facing_direction = choice(self.view_directions)
+            self.facing_direction = get_stream('entities').choice(self.view_directions)
 
     def get_dialog(self) -> List[str]:
         return self.character_data['dialog'][f"{'defeated' if self.character_data['defeated'] else 'default'}"]
@@ -124,10 +130,12 @@ class Character(Entity):
                 self.create_dialog(self)
                 self.player.noticed = False
 
-    def update(self, dt: float) -> None:
+    def stop_timers(self) -> None:
         for timer in self.timers.values():
-            timer.update()
+            timer.cancel()
 
+    def update(self, dt: float) -> None:
+        self.previous_pos.update(self.rect.topleft)
         self.animate(dt)
         if self.character_data['look_around']:
             self.raycast()
@@ -141,14 +149,14 @@ class Player(Entity):
         frames: Dict[str, List[pygame.Surface]], 
         groups: GroupsArgument,
         facing_direction: str,
-        collision_sprites: pygame.sprite.Group
+        collision_sprites: 'CollisionSprites'
     ) -> None:
         super().__init__(pos, frames, groups, facing_direction)
         self.collision_sprites = collision_sprites
         self.noticed = False
 
     def input(self) -> None:
-        keys = pygame.key.get_pressed()
+        keys = get_pressed()
         input_vector = pygame.math.Vector2()
         if keys[pygame.K_UP]:
             input_vector.y -= 1
@@ -171,7 +179,7 @@ class Player(Entity):
         self.collisions('vertical')
 
     def collisions(self, axis: str) -> None:
-        for sprite in self.collision_sprites:
+        for sprite in self.collision_sprites.query(self.hitbox):
             if sprite.hitbox.colliderect(self.hitbox):
                 if axis == "horizontal":
                     if self.direction.x > 0:
@@ -187,6 +195,7 @@ class Player(Entity):
                     self.rect.centery = self.hitbox.centery
 
     def update(self, dt: float) -> None:
+        self.previous_pos.update(self.rect.topleft)
         self.y_sort = self.rect.centery
         if not self.blocked:
             self.input()
@@ -3,6 +3,7 @@ from settings import *
 from timer_ import Timer
 from monster import Monster
 from typing import Dict, List, Callable
+from surface_cache import scaled2x, silhouette
 
 
 class Evolution:
@@ -13,15 +14,15 @@ class Evolution:
         star_frames: List[pygame.Surface]
     ):
         self.display_surface = pygame.display.get_surface()
-        self.start_monster_surf = pygame.transform.scale2x(frames[start_monster]['idle'][0])
-        self.end_monster_surf = pygame.transform.scale2x(frames[end_monster]['idle'][0])
+        self.start_monster_surf = scaled2x(frames[start_monster]['idle'][0])
+        self.end_monster_surf = scaled2x(frames[end_monster]['idle'][0])
         self.timers: Dict[str, Timer] = {
             'start': Timer(800, autostart=True),
             'end': Timer(1800, func=end_evolution)
         }
 
         # star animation
-        self.star_frames = [pygame.transform.scale2x(frame) for frame in star_frames]
+        self.star_frames = [scaled2x(frame) for frame in star_frames]
         self.frame_index = 0
 
         # screen tint
@@ -29,8 +30,8 @@ class Evolution:
         self.tint_surf.set_alpha(200)
 
         # white tint
-        self.start_monster_surf_white = pygame.mask.from_surface(self.start_monster_surf).to_surface()
-        self.start_monster_surf_white.set_colorkey('black')
+        # copied, the alpha of this one is faded in below
+        self.start_monster_surf_white = silhouette(self.start_monster_surf).copy()
         self.tint_amount = 0
         self.tint_speed = 80
         self.start_monster_surf_white.set_alpha(self.tint_amount)
@@ -40,17 +41,26 @@ class Evolution:
         self.start_text_surf = self.font.render(f"{start_monster} is evolving", False, COLORS['black'])
         self.end_text_surf = self.font.render(f"{start_monster} evolved into {end_monster}", False, COLORS['black'])
 
-    def display_stars(self, dt: float):
-        self.frame_index += 20 * dt
+    def stop_timers(self):
+        for timer in self.timers.values():
+            timer.cancel()
+
+    def display_stars(self):
         if self.frame_index < len(self.star_frames):
             frame = self.star_frames[int(self.frame_index)]
             rect = frame.get_frect(center = (self.display_surface.get_width() / 2, self.display_surface.get_height() / 2))
             self.display_surface.blit(frame, rect)
 
-    def update(self, dt: float):
-        for timer in self.timers.values():
-            timer.update()
+    def simulate(self, dt: float):
+        if not self.timers['start'].active:
+            if self.tint_amount < 255:
+                self.tint_amount += self.tint_speed * dt
+            else:
+                self.frame_index += 20 * dt
+                if not self.timers['end'].active:
+                    self.timers['end'].activate()
 
+    def draw(self):
         if not self.timers['start'].active:
             self.display_surface.blit(self.tint_surf, (0, 0))
 
@@ -58,7 +68,6 @@ class Evolution:
                 rect = self.start_monster_surf.get_frect(center = (self.display_surface.get_width() / 2, self.display_surface.get_height() / 2))
                 self.display_surface.blit(self.start_monster_surf, rect)
 
-                self.tint_amount += self.tint_speed * dt
                 self.start_monster_surf_white.set_alpha(self.tint_amount)
                 self.display_surface.blit(self.start_monster_surf_white, rect)
             
@@ -72,7 +81,4 @@ class Evolution:
                 text_rect = self.end_text_surf.get_frect(midtop = rect.midbottom + pygame.Vector2(0, 20))
                 pygame.draw.rect(self.display_surface, COLORS['white'], text_rect.inflate(20, 20), 0, 5)
                 self.display_surface.blit(self.end_text_surf, text_rect)
-                self.display_stars(dt)
-                
-                if not self.timers['end'].active:
-                    self.timers['end'].activate()
+                self.display_stars()
@@ -1,41 +1,230 @@
-import os
 import json
+from types import MappingProxyType
+from data_compiler import load_bundle
 from support import get_path
-from typing import Union
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+def freeze(data: Any) -> Any:
+    if isinstance(data, dict):
+        return MappingProxyType({key: freeze(value) for key, value in data.items()})
+    if isinstance(data, list):
+        return tuple(freeze(value) for value in data)
+    return data
 
 
 class Data:
-    _cache = {}
-    path: str = ""
+    """Records of one section of the compiled data bundle, see data_compiler."""
+    section: str = ""
+    frozen: bool = True
+    _records: Optional[Dict[str, Any]] = None
+    _all: List[Any] = []
+
+    @classmethod
+    def load(cls) -> None:
+        records = {}
+        for id, data in load_bundle()[cls.section].items():
+            data = cls.prepare(data)
+            records[id] = freeze(data) if cls.frozen else data
+        cls._records = records
+        cls._all = list(records.values())
+        cls.build_indexes()
+
+    @classmethod
+    def build_indexes(cls) -> None:
+        pass
+
+    @classmethod
+    def ensure_loaded(cls) -> None:
+        if cls._records is None:
+            cls.load()
 
     @classmethod
     def get(cls, id: Union[str, int]):
-        cached_data = cls._cache.get(id)
-        if cached_data is None:
-            with open(get_path(cls.path, f"{id}.json"), "r", encoding="utf-8") as f:
-                cached_data = json.load(f)
-                cls._cache[id] = cached_data
-        return cached_data
+        cls.ensure_loaded()
+        data = cls._records.get(id)
+        if data is None:
+            # monster ids are capitalised names but the files are lower case
+            data = cls._records.get(f"{id}".lower())
+            if data is None:
+                raise KeyError(f"No {cls.section} data for '{id}'")
+        return data
+
+    @classmethod
+    def prepare(cls, data: dict) -> dict:
+        return data
     
     @classmethod
     def all(cls):
-        all_data = []
-        for filename in os.listdir(cls.path):
-            if filename.lower().endswith(".json"):
-                id = filename.split(".")[0]
-                data = cls.get(id)
-                all_data.append(data)
-
-        return all_data
+        cls.ensure_loaded()
+        return cls._all
     
 
 class TrainerData(Data):
-    path = get_path("data", "trainers")
+    section = "trainers"
+    # the game flips the defeated flag on these
+    frozen = False
 
 
 class MonsterData(Data):
-    path = get_path("data", "monsters")
+    section = "monsters"
+
+    # built once on load, records are immutable so these never go stale
+    _dex: Tuple[Any, ...] = ()
+    _by_name: Dict[str, Any] = {}
+    _by_number: Dict[int, Any] = {}
+    _by_element: Dict[str, Tuple[Any, ...]] = {}
+    _evolves_to: Dict[str, Tuple[str, int]] = {}
+    _evolves_from: Dict[str, Tuple[str, ...]] = {}
+    _max_stats: Dict[str, float] = {}
+
+    @classmethod
+    def prepare(cls, data: dict) -> dict:
+        data['element_id'] = ElementData.get_id(data['stats']['element'])
+        return data
+
+    @classmethod
+    def build_indexes(cls) -> None:
+        cls._dex = tuple(sorted(cls._all, key = lambda data: data.get('number', 9999)))
+        cls._by_name = {data['name']: data for data in cls._dex}
+        cls._by_number = {data['number']: data for data in cls._dex}
+
+        by_element: Dict[str, List[Any]] = {}
+        evolves_from: Dict[str, List[str]] = {}
+        cls._evolves_to = {}
+        cls._max_stats = {}
+        for data in cls._dex:
+            by_element.setdefault(data['stats']['element'], []).append(data)
+            if data['evolve']:
+                target, level = data['evolve']
+                cls._evolves_to[data['name']] = (target, level)
+                evolves_from.setdefault(target, []).append(data['name'])
+            for stat, value in data['stats'].items():
+                if stat != 'element':
+                    cls._max_stats[stat] = max(value, cls._max_stats.get(stat, value))
+        cls._by_element = {element: tuple(monsters) for element, monsters in by_element.items()}
+        cls._evolves_from = {name: tuple(names) for name, names in evolves_from.items()}
+
+    @classmethod
+    def get_dex(cls) -> Tuple[Any, ...]:
+        """Every monster in dex number order."""
+        cls.ensure_loaded()
+        return cls._dex
+
+    @classmethod
+    def get_by_number(cls, number: int) -> Optional[Any]:
+        cls.ensure_loaded()
+        return cls._by_number.get(number)
+
+    @classmethod
+    def get_by_element(cls, element: str) -> Tuple[Any, ...]:
+        cls.ensure_loaded()
+        return cls._by_element.get(element, ())
+
+    @classmethod
+    def get_evolution(cls, name: str) -> Optional[Tuple[str, int]]:
+        """The monster name evolves into and the level it happens at."""
+        cls.ensure_loaded()
+        return cls._evolves_to.get(name)
+
+    @classmethod
+    def get_pre_evolutions(cls, name: str) -> Tuple[str, ...]:
+        cls.ensure_loaded()
+        return cls._evolves_from.get(name, ())
+
+    @classmethod
+    def get_evolution_chain(cls, name: str) -> Tuple[str, ...]:
+        """The whole line name belongs to, from its first form to its last."""
+        cls.ensure_loaded()
+        first, seen = name, {name}
+        while cls._evolves_from.get(first) and cls._evolves_from[first][0] not in seen:
+            first = cls._evolves_from[first][0]
+            seen.add(first)
+
+        chain = [first]
+        while chain[-1] in cls._evolves_to and cls._evolves_to[chain[-1]][0] not in chain:
+            chain.append(cls._evolves_to[chain[-1]][0])
+        return tuple(chain)
+
+    @classmethod
+    def get_max_stat(cls, stat: str) -> float:
+        """The highest base value of stat across the whole dex."""
+        cls.ensure_loaded()
+        return cls._max_stats[stat]
+
+    @classmethod
+    def get_max_stats(cls) -> Dict[str, float]:
+        cls.ensure_loaded()
+        return dict(cls._max_stats)
 
 
 class AttackData(Data):
-    path = get_path("data", "attacks")
+    section = "attacks"
+
+    _by_element: Dict[str, Tuple[Any, ...]] = {}
+    _by_target: Dict[str, Tuple[Any, ...]] = {}
+
+    @classmethod
+    def prepare(cls, data: dict) -> dict:
+        data['element_id'] = ElementData.get_id(data['element'])
+        return data
+
+    @classmethod
+    def build_indexes(cls) -> None:
+        by_element: Dict[str, List[Any]] = {}
+        by_target: Dict[str, List[Any]] = {}
+        for data in sorted(cls._all, key = lambda data: data['name']):
+            by_element.setdefault(data['element'], []).append(data)
+            by_target.setdefault(data['target'], []).append(data)
+        cls._by_element = {element: tuple(attacks) for element, attacks in by_element.items()}
+        cls._by_target = {target: tuple(attacks) for target, attacks in by_target.items()}
+
+    @classmethod
+    def get_by_element(cls, element: str) -> Tuple[Any, ...]:
+        cls.ensure_loaded()
+        return cls._by_element.get(element, ())
+
+    @classmethod
+    def get_by_target(cls, target: str) -> Tuple[Any, ...]:
+        """'player' attacks land on the user's own side, 'opponent' ones on the other side."""
+        cls.ensure_loaded()
+        return cls._by_target.get(target, ())
+
+
+class ElementData:
+    """Elements interned to small ints, with an attack element x target element damage multiplier matrix."""
+    path = get_path("data", "elements.json")
+    ids: Dict[str, int] = {}
+    names: List[str] = []
+    matrix: List[List[float]] = []
+
+    @classmethod
+    def load(cls) -> None:
+        with open(cls.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for name in data['elements']:
+            cls.add(name)
+        for attack_element, targets in data['effectiveness'].items():
+            for target_element, multiplier in targets.items():
+                cls.matrix[cls.get_id(attack_element)][cls.get_id(target_element)] = float(multiplier)
+
+    @classmethod
+    def add(cls, name: str) -> int:
+        # elements only found in monster or attack data are neutral against everything
+        cls.ids[name] = len(cls.names)
+        cls.names.append(name)
+        for row in cls.matrix:
+            row.append(1.0)
+        cls.matrix.append([1.0] * len(cls.names))
+        return cls.ids[name]
+
+    @classmethod
+    def get_id(cls, name: str) -> int:
+        if not cls.names:
+            cls.load()
+        element_id = cls.ids.get(name)
+        return element_id if element_id is not None else cls.add(name)
+
+    @classmethod
+    def get_multiplier(cls, attack_element: int, target_element: int) -> float:
+        return cls.matrix[attack_element][target_element]
@@ -1,12 +1,63 @@
 import pygame
+from bisect import bisect_left, bisect_right
+from math import inf
 from settings import *
-from typing import Tuple
+from typing import Tuple, Dict, List
 from support import import_image
 from entities import Entity, Player
 from sprites import MonsterSprite
+from spatial import SpatialGrid
 
 
-class AllSprites(pygame.sprite.Group):
+class SpatialGroup(pygame.sprite.Group):
+    def __init__(self) -> None:
+        super().__init__()
+        self.grid = SpatialGrid(SPATIAL_CELL_SIZE)
+        self.insertion_order: Dict[pygame.sprite.Sprite, int] = {}
+        self.added_count = 0
+        self.unindexed_sprites: Dict[pygame.sprite.Sprite, None] = {}
+        self.moving_sprites: Dict[Entity, pygame.FRect] = {}
+
+    def get_bounds(self, sprite: pygame.sprite.Sprite) -> pygame.FRect:
+        return sprite.rect
+
+    def add_internal(self, sprite: pygame.sprite.Sprite, layer = None) -> None:
+        super().add_internal(sprite, layer)
+        self.added_count += 1
+        self.insertion_order[sprite] = self.added_count
+        # sprites join their groups before their rect exists, so indexing waits for the next query
+        self.unindexed_sprites[sprite] = None
+
+    def remove_internal(self, sprite: pygame.sprite.Sprite) -> None:
+        super().remove_internal(sprite)
+        del self.insertion_order[sprite]
+        self.unindexed_sprites.pop(sprite, None)
+        self.moving_sprites.pop(sprite, None)
+        self.grid.remove(sprite)
+
+    def refresh_index(self) -> None:
+        for sprite in self.unindexed_sprites:
+            bounds = self.get_bounds(sprite)
+            self.grid.insert(sprite, bounds)
+            if isinstance(sprite, Entity):
+                self.moving_sprites[sprite] = bounds.copy()
+        self.unindexed_sprites.clear()
+
+        for sprite, indexed_bounds in self.moving_sprites.items():
+            bounds = self.get_bounds(sprite)
+            if bounds != indexed_bounds:
+                self.grid.move(sprite, bounds)
+                indexed_bounds.update(bounds)
+
+    def query(self, rect: pygame.FRect) -> List[pygame.sprite.Sprite]:
+        self.refresh_index()
+        return sorted(
+            [sprite for sprite in self.grid.query(rect) if rect.colliderect(self.get_bounds(sprite))],
+            key = self.insertion_order.__getitem__
+        )
+
+
+class AllSprites(SpatialGroup):
     def __init__(self) -> None:
         super().__init__()
         self.display_surface = pygame.display.get_surface()
@@ -14,28 +65,100 @@ class AllSprites(pygame.sprite.Group):
         self.shadow_surf = import_image("graphics", "other", "shadow")
         self.notice_surf = import_image("graphics", "ui", "notice")
 
-    def draw(self, player: Player) -> None:
-        self.offset.x = -(player.rect.centerx - WINDOW_WIDTH / 2)
-        self.offset.y = -(player.rect.centery - WINDOW_HEIGHT / 2)
+        # main layer kept in (y_sort, insertion order) order, so only moved sprites get re-inserted
+        self.depth_keys: List[Tuple[float, int]] = []
+        self.depth_sprites: List[pygame.sprite.Sprite] = []
+        self.sprite_depth_keys: Dict[pygame.sprite.Sprite, Tuple[float, int]] = {}
+        self.depth_reach = 0
+
+    def remove_internal(self, sprite: pygame.sprite.Sprite) -> None:
+        self.remove_depth(sprite)
+        super().remove_internal(sprite)
+
+    def insert_depth(self, sprite: pygame.sprite.Sprite) -> None:
+        key = (sprite.y_sort, self.insertion_order[sprite])
+        index = bisect_left(self.depth_keys, key)
+        self.depth_keys.insert(index, key)
+        self.depth_sprites.insert(index, sprite)
+        self.sprite_depth_keys[sprite] = key
+        self.update_depth_reach(sprite)
+
+    def remove_depth(self, sprite: pygame.sprite.Sprite) -> None:
+        key = self.sprite_depth_keys.pop(sprite, None)
+        if key is not None:
+            index = bisect_left(self.depth_keys, key)
+            del self.depth_keys[index]
+            del self.depth_sprites[index]
+
+    def update_depth_reach(self, sprite: pygame.sprite.Sprite) -> None:
+        # how far a sprite's rect can extend from its y_sort, used to bound the depth lookup around the camera
+        self.depth_reach = max(self.depth_reach, sprite.y_sort - sprite.rect.top, sprite.rect.bottom - sprite.y_sort)
 
-        bg_sprites = [sprite for sprite in self if sprite.z < WORLD_LAYERS['main']]
-        main_sprites = sorted([sprite for sprite in self if sprite.z == WORLD_LAYERS['main']], key = lambda sprite: sprite.y_sort)
-        fg_sprites = [sprite for sprite in self if sprite.z > WORLD_LAYERS['main']]
+    def refresh_index(self) -> None:
+        new_sprites = [sprite for sprite in self.unindexed_sprites if sprite.z == WORLD_LAYERS['main']]
+        super().refresh_index()
+
+        for sprite in new_sprites:
+            self.insert_depth(sprite)
+
+        for sprite in self.moving_sprites:
+            if sprite in self.sprite_depth_keys:
+                if self.sprite_depth_keys[sprite][0] != sprite.y_sort:
+                    self.remove_depth(sprite)
+                    self.insert_depth(sprite)
+                else:
+                    self.update_depth_reach(sprite)
+
+    def draw(self, player: Player, alpha: float = 1) -> None:
+        # alpha is how far the frame is between the previous and the current simulation step
+        player_pos = self.get_draw_pos(player, alpha)
+
+        # whole-pixel camera so that baked chunks and individual tiles land on the same pixels
+        self.offset.x = -int(player_pos.x + player.rect.width / 2 - WINDOW_WIDTH / 2)
+        self.offset.y = -int(player_pos.y + player.rect.height / 2 - WINDOW_HEIGHT / 2)
+        view_rect = pygame.FRect(-self.offset.x, -self.offset.y, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+        visible_sprites = self.query(view_rect)
+        visible_set = set(visible_sprites)
+
+        first = bisect_left(self.depth_keys, (view_rect.top - self.depth_reach,))
+        last = bisect_right(self.depth_keys, (view_rect.bottom + self.depth_reach, inf))
+
+        bg_sprites = [sprite for sprite in visible_sprites if sprite.z < WORLD_LAYERS['main']]
+        main_sprites = [sprite for sprite in self.depth_sprites[first:last] if sprite in visible_set]
+        fg_sprites = [sprite for sprite in visible_sprites if sprite.z > WORLD_LAYERS['main']]
 
         for layer in (bg_sprites, main_sprites, fg_sprites):
             for sprite in layer:
                 if isinstance(sprite, Entity):
-                    self.display_surface.blit(self.shadow_surf, sprite.rect.topleft + self.offset + pygame.math.Vector2(40, 110))
-                self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
+                    pos = self.get_draw_pos(sprite, alpha)
+                    self.display_surface.blit(self.shadow_surf, pos + self.offset + pygame.math.Vector2(40, 110))
+                else:
+                    pos = sprite.rect.topleft
+                self.display_surface.blit(sprite.image, pos + self.offset)
                 if sprite == player and player.noticed:
-                    rect = self.notice_surf.get_frect(midbottom = sprite.rect.midtop)
+                    rect = self.notice_surf.get_frect(midbottom = sprite.rect.midtop).move(pos - pygame.Vector2(sprite.rect.topleft))
                     self.display_surface.blit(self.notice_surf, rect.topleft + self.offset)
 
+    @staticmethod
+    def get_draw_pos(entity: Entity, alpha: float) -> pygame.Vector2:
+        if alpha >= 1:
+            return pygame.Vector2(entity.rect.topleft)
+        return entity.previous_pos.lerp(entity.rect.topleft, alpha)
+
+
+class CollisionSprites(SpatialGroup):
+    def get_bounds(self, sprite: pygame.sprite.Sprite) -> pygame.FRect:
+        return sprite.hitbox
+
 
 class BattleSprites(pygame.sprite.Group):
     def __init__(self):
         super().__init__()
         self.display_surface = pygame.display.get_surface()
+        # sprite -> (image, screen rect) of the previous frame, to work out what changed on screen
+        self.drawn: Dict[pygame.sprite.Sprite, Tuple[pygame.Surface, pygame.Rect]] = {}
+        self.dirty_rects: List[pygame.Rect] = []
 
     def draw(self, current_monster_sprite: MonsterSprite, side: str, mode: str, target_index: int, player_sprites: pygame.sprite.Group, opponent_sprites: pygame.sprite.Group):
         # get available positions
@@ -43,10 +166,34 @@ class BattleSprites(pygame.sprite.Group):
         sprites = {sprite.pos_index: sprite for sprite in sprite_group}
         monster_sprite = sprites[list(sprites.keys())[target_index]] if sprites else None
 
+        drawn = {}
         for sprite in sorted(self, key = lambda sprite: sprite.z):
             if sprite.z == BATTLE_LAYERS['outline']:
                 if sprite.monster_sprite == current_monster_sprite and not (mode == 'target' and side == 'player') or\
                 sprite.monster_sprite == monster_sprite and sprite.monster_sprite.entity == side and mode and mode == 'target':
                     self.display_surface.blit(sprite.image, sprite.rect)
+                    drawn[sprite] = (sprite.image, self.get_screen_rect(sprite.rect))
             else:
                 self.display_surface.blit(sprite.image, sprite.rect)
+                drawn[sprite] = (sprite.image, self.get_screen_rect(sprite.rect))
+
+        self.dirty_rects = self.get_dirty_rects(drawn)
+        self.drawn = drawn
+
+    @staticmethod
+    def get_screen_rect(rect: pygame.FRect) -> pygame.Rect:
+        # one pixel of slack around float rects, blits round where Rect() truncates
+        return pygame.Rect(rect).inflate(2, 2)
+
+    def get_dirty_rects(self, drawn: Dict[pygame.sprite.Sprite, Tuple[pygame.Surface, pygame.Rect]]) -> List[pygame.Rect]:
+        dirty_rects = []
+        for sprite, (image, rect) in drawn.items():
+            previous = self.drawn.get(sprite)
+            if previous is None:
+                dirty_rects.append(rect)
+            elif previous[0] is not image or previous[1] != rect or getattr(sprite, 'dirty', False):
+                dirty_rects.append(rect.union(previous[1]))
+
+        # sprites that died or got hidden leave the background behind
+        dirty_rects.extend(rect for sprite, (_, rect) in self.drawn.items() if sprite not in drawn)
+        return dirty_rects
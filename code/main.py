@@ -2,16 +2,13 @@ import os
 import sys
 
 import pygame
-import pytmx
-from pytmx.util_pygame import load_pygame
-from random import randint
-from typing import Dict
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
 from settings import *
-from timer_ import Timer
-from sprites import Sprite, AnimatedSprite, MonsterPatchSprite, BorderSprite, CollidableSprite, TransitionSprite
+from timer_ import Timer, TimerScheduler
+from sprites import Sprite, TerrainChunkSprite, AnimatedSprite, MonsterPatchSprite, BorderSprite, CollidableSprite, TransitionSprite
 from entities import Player, Character
-from groups import AllSprites
+from groups import AllSprites, CollisionSprites
 from dialog import DialogTree
 from game_data import *
 from support import *
@@ -20,10 +17,21 @@ from menu import Menu
 from battle import Battle
 from evolution import Evolution
 from save_ import Save
+from storage import MonsterStorage
+from map_manager import MapManager
+from map_compiler import CompiledMap, CompiledTileLayer
+from outlines import MonsterOutlines
+from controls import get_just_pressed
+from rng import get_stream
+
+if TYPE_CHECKING:
+    from replay import Session
 
 
 class Game:
-    def __init__(self) -> None:
+    def __init__(self, session: Optional['Session'] = None) -> None:
+        # a recording or replay steps the game one fixed tick per frame, see replay.py
+        self.session = session
         pygame.init()
         self.display_surface = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption("Project Monster")
@@ -32,14 +40,21 @@ class Game:
         self.encounter_timer = Timer(2000, func = self.monster_encounter)
 
         # player monster
-        player_monster_data = Save().get("team", [])
+        self.save = Save()
+        player_monster_data = self.save.get("team", [])
         self.player_monster: Dict[int, Monster] = {}
-        for i in range(len(player_monster_data)):
-            self.player_monster[i] = Monster(*player_monster_data[i])
+        for i, (name, level, *xp) in enumerate(player_monster_data):
+            self.player_monster[i] = Monster(name, level)
+            # saves from before xp was kept start the level at 0
+            if xp:
+                self.player_monster[i].xp = xp[0]
+        self.storage = MonsterStorage(session.storage_path if session else None)
+        # a crash between a storage change and the save with the new team leaves it to undo
+        self.storage.reconcile(self.save.get("storage"))
 
         # groups
         self.all_sprites = AllSprites()
-        self.collision_sprites = pygame.sprite.Group()
+        self.collision_sprites = CollisionSprites()
         self.character_sprites = pygame.sprite.Group()
         self.transition_sprites = pygame.sprite.Group()
         self.monster_sprites = pygame.sprite.Group()
@@ -52,21 +67,35 @@ class Game:
         self.tint_direction = -1
         self.tint_speed = 600
 
+        for character_id in self.save.get("defeated_trainers", []):
+            TrainerData.get(character_id)['defeated'] = True
+
         self.import_assets()
-        self.setup(self.tmx_maps['world'], "house")
+        self.map_name = 'world'
+        self.setup(self.tmx_maps[self.map_name], "house")
+        self.restore_position(self.save.get("position"))
         self.audio['overworld'].set_volume(0)
         self.audio['overworld'].play(-1)
 
         # overlays
         self.dialog_tree = None
-        self.menu = Menu(self.player_monster, self.monster_frames, self.fonts)
+        self.menu = Menu(self.player_monster, self.storage, self.monster_frames, self.fonts)
         self.battle = None
         self.evolution = None
 
+        # save sections, snapshots are plain copies the save writer thread can own
+        self.save.register('team', lambda: [[monster.name, monster.level, monster.xp] for monster in self.player_monster.values()])
+        self.save.register('encyclopedia', self.menu.encyclopedia.get_save_data)
+        self.save.register('position', lambda: {"world": self.map_name, "x": round(self.player.rect.centerx, 2), "y": round(self.player.rect.centery, 2)})
+        self.save.register('defeated_trainers', lambda: [data['id'] for data in TrainerData.all() if data['defeated']])
+        self.save.register('storage', lambda: self.storage.change)
+
+        # saves from before storage kept every monster in the team
+        self.store_overflow()
         self.check_evolution()
 
     def import_assets(self) -> None:
-        self.tmx_maps = tmx_importer("data", "maps")
+        self.tmx_maps = MapManager("data", "maps")
 
         self.overworld_frames = {
             'water': import_folder("graphics", "tilesets", "water"),
@@ -80,7 +109,7 @@ class Game:
             'ui': import_folder_dict("graphics", "ui"),
             'attacks': attack_importer("graphics", "attacks")
         }
-        self.monster_frames['outlines'] = outline_creator(self.monster_frames['monsters'], 4)
+        self.monster_frames['outlines'] = MonsterOutlines(self.monster_frames['monsters'], BATTLE_OUTLINE_WIDTH)
 
         self.fonts = {
             "dialog": pygame.font.Font(get_path("graphics", "fonts", "PixeloidSans.ttf"), 30),
@@ -94,16 +123,37 @@ class Game:
 
         self.audio: Dict[str, pygame.mixer.Sound] = audio_importer("audio")
 
-    def setup(self, tmx_map: pytmx.TiledMap, player_start_pos: str) -> None:
-        # clear the map
+    def restore_position(self, position: Optional[Dict[str, Any]]) -> None:
+        # unknown maps, like ones renamed since the save, keep the default start
+        if not position or position.get("world") not in self.tmx_maps:
+            return
+
+        if position["world"] != self.map_name:
+            tmx_map = self.tmx_maps[position["world"]]
+            start = next(obj.properties["pos"] for obj in tmx_map.get_layer_by_name("Entities") if obj.name == "Player")
+            self.map_name = position["world"]
+            self.setup(tmx_map, start)
+
+        self.player.rect.center = (position["x"], position["y"])
+        self.player.hitbox.center = self.player.rect.center
+        self.player.previous_pos.update(self.player.rect.topleft)
+
+    def setup(self, tmx_map: CompiledMap, player_start_pos: str) -> None:
+        # clear the map, characters left behind stop looking around
+        for character in self.character_sprites:
+            character.stop_timers()
         for group in (self.all_sprites, self.collision_sprites, self.transition_sprites, self.character_sprites):
             group.empty()
 
         # terrain
-        for layer in ['Terrain', 'Terrain Top']:
-            terrain_layer: pytmx.TiledTileLayer = tmx_map.get_layer_by_name(layer)
-            for x, y, surf in terrain_layer.tiles():
-                Sprite((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites, WORLD_LAYERS['bg'])
+        if BAKE_TERRAIN:
+            for pos, surf in bake_tile_layers(tmx_map, ['Terrain', 'Terrain Top'], TERRAIN_CHUNK_SIZE).items():
+                TerrainChunkSprite(pos, surf, self.all_sprites)
+        else:
+            for layer in ['Terrain', 'Terrain Top']:
+                terrain_layer: CompiledTileLayer = tmx_map.get_layer_by_name(layer)
+                for x, y, surf in terrain_layer.tiles():
+                    Sprite((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites, WORLD_LAYERS['bg'])
 
         # water
         for obj in tmx_map.get_layer_by_name("Water"):
@@ -167,9 +217,14 @@ class Game:
                     notice_sound = self.audio['notice']
                 )
 
+        self.collision_sprites.refresh_index()
+
+        # parse the maps reachable from here while the player walks around
+        self.tmx_maps.prefetch(sprite.target[0] for sprite in self.transition_sprites)
+
     def input(self) -> None:
         if not self.dialog_tree and not self.battle and not self.menu.is_open:
-            keys = pygame.key.get_just_pressed()
+            keys = get_just_pressed()
             if keys[pygame.K_SPACE]:
                 for character in self.character_sprites:
                     if check_connections(100, self.player, character):
@@ -181,6 +236,14 @@ class Game:
             if keys[pygame.K_RETURN]:
                 self.menu.open()
 
+        # overlays read the keys here too, once per frame however many steps it runs
+        if self.dialog_tree:
+            self.dialog_tree.input()
+        if self.menu.is_open:
+            self.menu.input()
+        if self.battle:
+            self.battle.input()
+
         self.player.blocked = self.menu.is_open
 
     def create_dialog(self, character: Character) -> None:
@@ -199,6 +262,7 @@ class Game:
         elif not character.character_data['defeated']:
             self.audio['overworld'].stop()
             self.audio['battle'].play(-1)
+            self.menu.encyclopedia.discover([monster.name for monster in character.monsters.values()], 'view')
             self.transition_target = Battle(
                 player_monsters = self.player_monster,
                 opponent_monsters = character.monsters,
@@ -221,7 +285,7 @@ class Game:
             self.transition_target = sprites[0].target
             self.tint_mode = 'tint'
 
-    def tint_screen(self, dt: float) -> None:
+    def update_tint(self, dt: float) -> None:
         if self.tint_mode == 'untint':
             self.tint_progress -= self.tint_speed * dt
 
@@ -231,13 +295,18 @@ class Game:
                 if type(self.transition_target) == Battle:
                     self.battle = self.transition_target
                 elif self.transition_target == 'level':
+                    self.battle.stop_timers()
                     self.battle = None
                 else:
-                    self.setup(self.tmx_maps[self.transition_target[0]], self.transition_target[1])
+                    self.map_name = self.transition_target[0]
+                    self.setup(self.tmx_maps[self.map_name], self.transition_target[1])
+                    self.save.mark_dirty('position')
                 self.tint_mode = 'untint'
                 self.transition_target = None
 
         self.tint_progress = max(0, min(self.tint_progress, 255))
+
+    def tint_screen(self) -> None:
         self.tint_surf.set_alpha(self.tint_progress)
         self.display_surface.blit(self.tint_surf, (0, 0))
 
@@ -246,13 +315,26 @@ class Game:
         self.audio['overworld'].play(-1)
         self.transition_target = 'level'
         self.tint_mode = 'tint'
+        # levels, xp and caught monsters
+        self.save.mark_dirty('team')
+        self.menu.encyclopedia.discover([monster.name for monster in self.player_monster.values()], 'catch')
+        self.store_overflow()
         if character:
             character.character_data['defeated'] = True
+            self.save.mark_dirty('defeated_trainers')
             self.create_dialog(character)
         elif not self.evolution:
             self.player.unblock()
             self.check_evolution()
 
+    def store_overflow(self) -> None:
+        overflow = [index for index in self.player_monster if index >= MAX_TEAM_SIZE]
+        if overflow:
+            self.storage.deposit([self.player_monster.pop(index) for index in sorted(overflow)])
+            # storage is written straight away, the team in the save file has to follow
+            self.save.mark_dirty('team', 'storage')
+            self.save.save()
+
     def check_evolution(self):
         for index, monster in self.player_monster.items():
             if monster.evolution:
@@ -267,7 +349,9 @@ class Game:
             self.audio['overworld'].play(-1)
 
     def end_evolution(self):
+        self.evolution.stop_timers()
         self.evolution = None
+        self.save.mark_dirty('team')
         self.player.unblock()
         self.audio['evolution'].stop()
         self.audio['overworld'].play(-1)
@@ -280,13 +364,15 @@ class Game:
     def monster_encounter(self):
         sprites = [sprite for sprite in self.monster_sprites if sprite.rect.colliderect(self.player.hitbox)]
         if sprites and self.player.direction:
-            self.encounter_timer.duration = randint(800, 2500)
+            self.encounter_timer.duration = get_stream('world').randint(800, 2500)
             self.player.block()
             self.audio['overworld'].stop()
             self.audio['battle'].play(-1)
+            opponent_monsters = {index: Monster(monster, sprites[0].level + get_stream('world').randint(-3, 3)) for index, monster in enumerate(sprites[0].monsters)}
+            self.menu.encyclopedia.discover([monster.name for monster in opponent_monsters.values()], 'view')
             self.transition_target = Battle(
                 player_monsters = self.player_monster,
-                opponent_monsters = {index: Monster(monster, sprites[0].level + randint(-3, 3)) for index, monster in enumerate(sprites[0].monsters)},
+                opponent_monsters = opponent_monsters,
                 monster_frames = self.monster_frames,
                 bg_surf = self.bg_frames[sprites[0].biome],
                 fonts = self.fonts,
@@ -296,7 +382,51 @@ class Game:
             )
             self.tint_mode = 'tint'
 
+    def simulate(self, dt: float) -> None:
+        # every timer that is due, owners no longer poll their own
+        TimerScheduler().update()
+        self.transition_check()
+        self.all_sprites.update(dt)
+        self.check_monster()
+        if self.player.direction:
+            self.save.mark_dirty('position')
+
+        # overlays
+        if self.menu.is_open:
+            self.menu.simulate(dt)
+        if self.battle:
+            self.battle.simulate(dt)
+        if self.evolution:
+            self.evolution.simulate(dt)
+        self.update_tint(dt)
+
+    def step_fixed(self, dt: float) -> Tuple[float, bool]:
+        """
+        Runs as many whole simulation steps as the frame time covers, up to MAX_SIMULATION_STEPS.
+        Returns how far drawing is into the next step and whether steps are still owed.
+        """
+        step = 1 / SIMULATION_RATE
+        # owing more than the skipped frames can catch up on, after a stall like a window drag, is dropped
+        self.accumulator = min(self.accumulator + dt, step * MAX_SIMULATION_STEPS * (MAX_SKIPPED_FRAMES + 1))
+        steps = 0
+        while self.accumulator >= step and steps < MAX_SIMULATION_STEPS:
+            self.simulation_time += step * 1000
+            self.simulate(step)
+            self.accumulator -= step
+            steps += 1
+
+        # owed steps stay in the accumulator, run drops frames to catch up instead of slowing the world
+        behind = self.accumulator >= step
+        return (1 if behind else self.accumulator / step), behind
+
     def run(self) -> None:
+        if FIXED_TIMESTEP and not self.session:
+            # timers run on simulation time, so they keep in step with the world
+            self.accumulator = 0.0
+            self.skipped_frames = 0
+            self.simulation_time = float(pygame.time.get_ticks())
+            TimerScheduler().set_time_source(lambda: int(self.simulation_time))
+
         while True:
             dt = self.clock.tick(self.target_fps) / 1000
             pygame.display.set_caption(f"Project Monster - {int(self.clock.get_fps())} FPS")
@@ -305,31 +435,51 @@ class Game:
             # event loop
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
+                    # write what changed since the last autosave and let it land
+                    self.save.save()
+                    self.save.flush(timeout = 5)
                     pygame.quit()
                     sys.exit()
 
             # update
-            self.encounter_timer.update()
+            if self.session:
+                self.session.begin_tick()
             self.input()
-            self.transition_check()
-            self.all_sprites.update(dt)
-            self.check_monster()
+            alpha = 1
+            if self.session:
+                self.simulate(self.session.step)
+            elif FIXED_TIMESTEP:
+                alpha, behind = self.step_fixed(dt)
+                # a machine that cannot even keep up with the steps alone still gets a frame now and then
+                if behind and self.skipped_frames < MAX_SKIPPED_FRAMES:
+                    self.skipped_frames += 1
+                    self.save.update()
+                    continue
+                self.skipped_frames = 0
+            else:
+                self.simulate(dt)
+            self.save.update()
 
-            # drawing
-            self.all_sprites.draw(self.player)
+            # drawing, a battle covers the whole world
+            if not self.battle or self.tint_progress:
+                self.all_sprites.draw(self.player, alpha)
 
             # overlays
-            if self.dialog_tree:
-                self.dialog_tree.update()
             if self.menu.is_open:
-                self.menu.update(dt)
+                self.menu.draw()
             if self.battle:
-                self.battle.update(dt)
+                self.battle.draw()
             if self.evolution:
-                self.evolution.update(dt)
+                self.evolution.draw()
+
+            self.tint_screen()
+            if DIRTY_RECT_UPDATES and self.battle and not (self.dialog_tree or self.menu.is_open or self.evolution or self.tint_progress):
+                pygame.display.update(self.battle.dirty_rects)
+            else:
+                pygame.display.update()
 
-            self.tint_screen(dt)
-            pygame.display.update()
+            if self.session and not self.session.end_tick(self):
+                return
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+import os
+import re
+import sys
+import hashlib
+import pytmx
+import pygame
+from array import array
+from bundle_file import read_bundle, write_bundle
+from pytmx.util_pygame import pygame_image_loader
+from support import get_path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+COMPILER_VERSION = 1
+MAGIC = b'PMMAP'
+COMPILED_FOLDER = ("data", "compiled", "maps")
+COMPILED_EXTENSION = ".mapc"
+
+# (image path relative to the game folder, colorkey, rect, flags) for every gid of a map
+ImageRecord = Tuple[str, Optional[str], Optional[Tuple[int, int, int, int]], Any]
+
+
+# region compile
+
+def fingerprint(tmx_path: str) -> bytes:
+    digest = hashlib.sha1(str(COMPILER_VERSION).encode())
+    with open(tmx_path, "rb") as f:
+        tmx_source = f.read()
+    digest.update(tmx_source)
+
+    # external tilesets change the gid -> image mapping too
+    for tileset_source in re.findall(rb'<tileset[^>]*source="([^"]+)"', tmx_source):
+        tileset_path = os.path.join(os.path.dirname(tmx_path), tileset_source.decode())
+        with open(tileset_path, "rb") as f:
+            digest.update(f.read())
+
+    return digest.digest()
+
+def recording_image_loader(filename: str, colorkey: Optional[str], **kwargs):
+    path = os.path.relpath(os.path.normpath(filename), get_path())
+
+    def load_image(rect = None, flags = None) -> ImageRecord:
+        return (path, colorkey, rect, flags)
+
+    return load_image
+
+def compile_map(tmx_path: str) -> Dict[str, Any]:
+    tmx_map = pytmx.TiledMap(tmx_path, image_loader = recording_image_loader)
+
+    layers = []
+    for layer in tmx_map.layers:
+        if isinstance(layer, pytmx.TiledTileLayer):
+            data = array('I', (gid for row in layer.data for gid in row))
+            layers.append(('tiles', layer.name, (layer.width, layer.height, data)))
+        elif isinstance(layer, pytmx.TiledObjectGroup):
+            objects = [(obj.name, obj.x, obj.y, obj.width, obj.height, obj.gid, dict(obj.properties)) for obj in layer]
+            layers.append(('objects', layer.name, objects))
+
+    return {
+        'size': (tmx_map.width, tmx_map.height),
+        'tile_size': (tmx_map.tilewidth, tmx_map.tileheight),
+        'properties': dict(tmx_map.properties),
+        'images': list(tmx_map.images),
+        'layers': layers
+    }
+
+def compiled_path(name: str) -> str:
+    return get_path(*COMPILED_FOLDER, name + COMPILED_EXTENSION)
+
+def compile_all(*path: str) -> List[str]:
+    folder = get_path(*path)
+    compiled = []
+    for file_name in sorted(os.listdir(folder)):
+        if file_name.lower().endswith('.tmx'):
+            tmx_path = os.path.join(folder, file_name)
+            name = file_name.split('.')[0]
+            write_bundle(compiled_path(name), MAGIC, COMPILER_VERSION, fingerprint(tmx_path), compile_map(tmx_path))
+            compiled.append(name)
+    return compiled
+
+# endregion
+
+# region runtime
+
+class CompiledTileLayer:
+    def __init__(self, parent: 'CompiledMap', name: str, width: int, height: int, data: array) -> None:
+        self.parent = parent
+        self.name = name
+        self.width = width
+        self.height = height
+        self.data = data
+
+    def iter_data(self) -> Iterator[Tuple[int, int, int]]:
+        for index, gid in enumerate(self.data):
+            yield index % self.width, index // self.width, gid
+
+    def tiles(self) -> Iterator[Tuple[int, int, pygame.Surface]]:
+        images = self.parent.images
+        for x, y, gid in self.iter_data():
+            if gid:
+                yield x, y, images[gid]
+
+
+class CompiledObject:
+    def __init__(self, parent: 'CompiledMap', name: Optional[str], x: float, y: float, width: float, height: float, gid: int, properties: Dict[str, Any]) -> None:
+        self.parent = parent
+        self.name = name
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.gid = gid
+        self.properties = properties
+
+    @property
+    def image(self) -> Optional[pygame.Surface]:
+        return self.parent.images[self.gid] if self.gid else None
+
+
+class CompiledObjectLayer(list):
+    def __init__(self, name: str, objects: List[CompiledObject]) -> None:
+        super().__init__(objects)
+        self.name = name
+
+
+class CompiledMap:
+    def __init__(self, compiled: Dict[str, Any]) -> None:
+        self.width, self.height = compiled['size']
+        self.tilewidth, self.tileheight = compiled['tile_size']
+        self.properties = compiled['properties']
+        self.images = self.load_images(compiled['images'])
+
+        self.layernames: Dict[str, Any] = {}
+        for kind, name, layer_data in compiled['layers']:
+            if kind == 'tiles':
+                self.layernames[name] = CompiledTileLayer(self, name, *layer_data)
+            else:
+                self.layernames[name] = CompiledObjectLayer(name, [CompiledObject(self, *obj) for obj in layer_data])
+
+    @staticmethod
+    def load_images(records: List[Optional[ImageRecord]]) -> List[Optional[pygame.Surface]]:
+        # same loader pytmx uses, so the surfaces are converted exactly like load_pygame does
+        loaders = {}
+        images = []
+        for record in records:
+            if not record:
+                images.append(None)
+                continue
+            path, colorkey, rect, flags = record
+            if (path, colorkey) not in loaders:
+                loaders[(path, colorkey)] = pygame_image_loader(get_path(path), colorkey)
+            images.append(loaders[(path, colorkey)](rect, flags))
+        return images
+
+    def get_layer_by_name(self, name: str):
+        try:
+            return self.layernames[name]
+        except KeyError:
+            raise ValueError(f'Layer "{name}" not found.')
+
+
+def load_map(name: str, tmx_path: Optional[str]) -> CompiledMap:
+    path = compiled_path(name)
+    source_fingerprint = fingerprint(tmx_path) if tmx_path and os.path.exists(tmx_path) else None
+
+    compiled = read_bundle(path, MAGIC, COMPILER_VERSION, source_fingerprint)
+    if compiled is None:
+        if source_fingerprint is None:
+            raise FileNotFoundError(f"No map source or compiled map for '{name}'")
+        compiled = compile_map(tmx_path)
+        try:
+            write_bundle(path, MAGIC, COMPILER_VERSION, source_fingerprint, compiled)
+        except OSError:
+            pass  # read-only install, compile again next launch
+
+    return CompiledMap(compiled)
+
+# endregion
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1:] or ["data", "maps"]
+    for name in compile_all(*folder):
+        print(f"compiled {name}")
@@ -0,0 +1,123 @@
+import os
+from collections import OrderedDict
+from queue import Queue
+from threading import Event, Lock, Thread
+from map_compiler import CompiledMap, COMPILED_FOLDER, COMPILED_EXTENSION, load_map
+from settings import *
+from support import get_path
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+
+class MapManager:
+    def __init__(self, *path: str, budget: int = MAP_CACHE_BUDGET) -> None:
+        # name -> TMX source, None when only the compiled map ships
+        self.paths: Dict[str, Optional[str]] = {}
+        compiled_folder = get_path(*COMPILED_FOLDER)
+        if os.path.isdir(compiled_folder):
+            for file_name in os.listdir(compiled_folder):
+                if file_name.endswith(COMPILED_EXTENSION):
+                    self.paths[file_name[:-len(COMPILED_EXTENSION)]] = None
+
+        folder = get_path(*path)
+        if os.path.isdir(folder):
+            for file_name in os.listdir(folder):
+                if file_name.lower().endswith('.tmx'):
+                    self.paths[file_name.split('.')[0]] = os.path.join(folder, file_name)
+        self.budget = budget
+
+        # name -> (map, estimated bytes), least recently used first
+        self.maps: OrderedDict[str, Tuple[CompiledMap, int]] = OrderedDict()
+        self.current: Optional[str] = None
+        self.lock = Lock()
+
+        # background prefetch, one map at a time so it does not fight the game loop
+        self.queued: Set[str] = set()
+        self.loading: Dict[str, Event] = {}
+        self.queue: Queue[str] = Queue()
+        self.worker: Optional[Thread] = None
+        # name -> why its prefetch failed, until the game asks for that map
+        self.errors: Dict[str, Exception] = {}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.paths
+
+    def __getitem__(self, name: str) -> CompiledMap:
+        if name not in self.paths:
+            raise KeyError(name)
+
+        with self.lock:
+            self.current = name
+            if name in self.maps:
+                self.maps.move_to_end(name)
+                return self.maps[name][0]
+            self.queued.discard(name)
+            loaded = self.loading.get(name)
+            prefetch_error = self.errors.pop(name, None)
+
+        if loaded:
+            # already being prefetched, waiting is cheaper than parsing it twice
+            loaded.wait()
+            return self[name]
+
+        try:
+            tmx_map = load_map(name, self.paths[name])
+        except Exception as e:
+            if prefetch_error is None:
+                raise
+            raise e from prefetch_error
+        self.store(name, tmx_map)
+        return tmx_map
+
+    def get_size(self, tmx_map: CompiledMap) -> int:
+        surfaces = {id(image): image for image in tmx_map.images if image}
+        return sum(surf.get_width() * surf.get_height() * surf.get_bytesize() for surf in surfaces.values())
+
+    def store(self, name: str, tmx_map: CompiledMap) -> None:
+        size = self.get_size(tmx_map)
+        with self.lock:
+            self.maps[name] = (tmx_map, size)
+            self.maps.move_to_end(name)
+            self.evict()
+
+    def evict(self) -> None:
+        used = sum(size for _, size in self.maps.values())
+        for name in list(self.maps):
+            if used <= self.budget:
+                break
+            if name != self.current:
+                used -= self.maps.pop(name)[1]
+
+    def prefetch(self, names: Iterable[str]) -> None:
+        with self.lock:
+            for name in names:
+                if name in self.paths and name not in self.maps and name not in self.loading and name not in self.queued:
+                    self.queued.add(name)
+                    self.queue.put(name)
+
+            if self.worker is None:
+                self.worker = Thread(target = self.prefetch_worker, daemon = True)
+                self.worker.start()
+
+    def prefetch_worker(self) -> None:
+        while True:
+            name = self.queue.get()
+            with self.lock:
+                if name not in self.queued:
+                    continue
+                self.queued.discard(name)
+                loaded = self.loading[name] = Event()
+
+            # a map that fails here is loaded again when the game asks for it, and that load reports both errors
+            error = None
+            try:
+                self.store(name, load_map(name, self.paths[name]))
+            except Exception as e:
+                error = e
+            finally:
+                with self.lock:
+                    del self.loading[name]
+                    if error is not None:
+                        self.errors[name] = error
+                    else:
+                        self.errors.pop(name, None)
+                loaded.set()
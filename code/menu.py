@@ -2,13 +2,18 @@ import pygame
 from typing import Dict
 from settings import *
 from team import Team
+from boxes import Boxes
 from timer_ import Timer
 from encyclopedia import Encyclopedia
 from monster import Monster
+from storage import MonsterStorage
+from text_cache import render_text
+from save_ import Save
+from controls import get_just_pressed
 
 
 class Menu:
-    def __init__(self, monsters: Dict[int, Monster], monster_frames: Dict[str, Dict[str, pygame.Surface]], fonts: Dict[str, pygame.font.Font]):
+    def __init__(self, monsters: Dict[int, Monster], storage: MonsterStorage, monster_frames: Dict[str, Dict[str, pygame.Surface]], fonts: Dict[str, pygame.font.Font]):
         self.display_surface = pygame.display.get_surface()
         self.monsters = monsters
         self.monster_frames = monster_frames
@@ -27,7 +32,7 @@ class Menu:
         ).move_to(center = (self.display_surface.get_width() / 2, self.display_surface.get_height() / 2))
 
         # Menu options
-        self.options = ["Team", "Inventory", "Encyclopedia", "Settings", "Save", "Quit"]
+        self.options = ["Team", "Storage", "Inventory", "Encyclopedia", "Settings", "Save", "Quit"]
 
         # List settings
         self.visible_items = len(self.options)
@@ -37,6 +42,7 @@ class Menu:
         # option
         self.current_menu = None
         self.team = Team(self.monsters, self.fonts, self.monster_frames)
+        self.boxes = Boxes(self.monsters, storage, self.fonts, self.monster_frames)
         self.encyclopedia = Encyclopedia(self.monster_frames, self.fonts)
 
     def open(self):
@@ -48,10 +54,15 @@ class Menu:
         self.opening_timer.deactivate()
 
     def input(self):
-        if self.opening_timer.active:
-            return
-        
-        keys = pygame.key.get_just_pressed()
+        # a page only gets keys from the frame after it opened, the return that opened it is spent
+        current_menu = self.current_menu
+        if not self.opening_timer.active:
+            self.navigate()
+        if current_menu and self.current_menu is current_menu:
+            current_menu.input()
+
+    def navigate(self):
+        keys = get_just_pressed()
         if self.current_menu is None:
             if keys[pygame.K_UP]:
                 self.index -= 1
@@ -63,6 +74,8 @@ class Menu:
                 option = self.options[self.index]
                 if option == "Team":
                     self.current_menu = self.team
+                elif option == "Storage":
+                    self.current_menu = self.boxes
                 elif option == "Inventory":
                     print("Inventory")
                 elif option == "Encyclopedia":
@@ -70,7 +83,7 @@ class Menu:
                 elif option == "Settings":
                     print("Settings")
                 elif option == "Save":
-                    print("Save")
+                    Save().save(full = True)
                 elif option == "Quit":
                     print("Quit")
 
@@ -102,15 +115,17 @@ class Menu:
             pygame.draw.rect(self.display_surface, bg_color, item_rect, border_radius=6)
 
             # Render text
-            text_surf = self.fonts['regular'].render(option, True, text_color)
+            text_surf = render_text(self.fonts['regular'], option, True, text_color)
             text_rect = text_surf.get_frect(center=item_rect.center)
             self.display_surface.blit(text_surf, text_rect)
 
-    def update(self, dt: float):
-        self.opening_timer.update()
-        self.input()
+    def simulate(self, dt: float):
         if self.current_menu:
-            self.current_menu.update(dt)
+            self.current_menu.simulate(dt)
+
+    def draw(self):
+        if self.current_menu:
+            self.current_menu.draw()
         else:
             self.display_surface.blit(self.tint_surf, (0, 0))
             self.display()
@@ -1,35 +1,92 @@
+from bisect import bisect_right
 from game_data import MonsterData, AttackData
-from random import randint
+from rng import get_stream
 from typing import *
 
 
+class Species:
+    """The data every monster of one kind shares, with its stats and ability lists per level memoized."""
+    __slots__ = ('name', 'element', 'element_id', 'base_stats', 'ability_levels', 'ability_names', 'ability_costs', 'evolution', 'level_stats', 'level_abilities')
+    species: Dict[str, 'Species'] = {}
+
+    def __init__(self, name: str) -> None:
+        monster_data = MonsterData.get(name)
+        self.name = name
+        self.element: str = monster_data['stats']['element']
+        self.element_id: int = monster_data['element_id']
+        self.base_stats: Dict[str, Any] = monster_data['stats']
+        self.evolution = monster_data['evolve']
+
+        # unlock levels sorted for bisect, the json keys are strings
+        abilities = sorted(((int(level), ability) for level, ability in monster_data['abilities'].items()), key = lambda item: item[0])
+        self.ability_levels: List[int] = [level for level, _ in abilities]
+        self.ability_names: List[str] = [ability for _, ability in abilities]
+        self.ability_costs: List[int] = [AttackData.get(ability)['cost'] for ability in self.ability_names]
+
+        self.level_stats: Dict[int, Dict[str, float]] = {}
+        self.level_abilities: Dict[int, int] = {}
+
+    @classmethod
+    def get(cls, name: str) -> 'Species':
+        if name not in cls.species:
+            cls.species[name] = Species(name)
+        return cls.species[name]
+
+    def get_stats(self, level: int) -> Dict[str, float]:
+        # shared between every monster of this species and level, never modify it
+        if level not in self.level_stats:
+            self.level_stats[level] = {stat: value * level for stat, value in self.base_stats.items() if stat != 'element'}
+        return self.level_stats[level]
+
+    def get_ability_count(self, level: int) -> int:
+        if level not in self.level_abilities:
+            self.level_abilities[level] = bisect_right(self.ability_levels, level)
+        return self.level_abilities[level]
+
+
 class Monster:
+    __slots__ = ('name', 'species', 'level_value', 'stats', 'ability_count', 'element', 'element_id', 'base_stats', 'health', 'energy', 'initiative', 'defending', 'xp', 'level_up', 'evolution')
+
     def __init__(self, name: str, level: int) -> None:
         self.name = name
+        self.species = Species.get(name)
         self.level = level
-        self.paused = False
 
         # stats
-        monster_data = MonsterData.get(name)
-        self.element: str = monster_data['stats']['element']
-        self.base_stats: Dict[str, int] = monster_data['stats']
-        self.health: int = self.base_stats['max_health'] * self.level
-        self.energy: int = self.base_stats['max_energy'] * self.level
-        self.initiative = randint(0, 100)
-        self.abilities: Dict[int, str] = monster_data['abilities']
+        self.element: str = self.species.element
+        self.element_id: int = self.species.element_id
+        self.base_stats: Dict[str, Any] = self.species.base_stats
+        self.health: int = self.get_stat('max_health')
+        self.energy: int = self.get_stat('max_energy')
+        self.initiative = get_stream('monster').randint(0, 100)
         self.defending = False
 
         # experience
         self.xp = 0
         self.level_up = self.level * 150
-        self.evolution = monster_data['evolve']
+        self.evolution = self.species.evolution
 
     def __repr__(self) -> str:
         return f'Monster: {self.name}, Lvl: {self.level}'
 
+    @property
+    def level(self) -> int:
+        return self.level_value
+
+    @level.setter
+    def level(self, level: int) -> None:
+        # the only place the level based caches are refreshed
+        self.level_value = level
+        self.stats = self.species.get_stats(level)
+        self.ability_count = self.species.get_ability_count(level)
+
+    @property
+    def abilities(self) -> Dict[str, str]:
+        return dict(zip(map(str, self.species.ability_levels), self.species.ability_names))
+
     def get_stat(self, stat: str) -> int:
-        return self.base_stats[stat] * self.level
-    
+        return self.stats[stat]
+
     def get_stats(self) -> Dict[str, int]:
         return {
             'health': self.get_stat('max_health'),
@@ -39,12 +96,14 @@ class Monster:
             'speed': self.get_stat('speed'),
             'recovery': self.get_stat('recovery')
         }
-    
+
     def get_abilities(self, all: bool = True) -> List[str]:
+        count = self.ability_count
         if all:
-            return [ability for lvl, ability in self.abilities.items() if self.level >= int(lvl)]
+            return self.species.ability_names[:count]
         else:
-            return [ability for lvl, ability in self.abilities.items() if self.level >= int(lvl) and AttackData.get(ability)['cost'] < self.energy]
+            costs = self.species.ability_costs
+            return [ability for index, ability in enumerate(self.species.ability_names[:count]) if costs[index] < self.energy]
 
     def get_info(self):
         return (
@@ -52,10 +111,10 @@ class Monster:
             (self.energy, self.get_stat('max_energy')),
             (self.initiative, 100)
         )
-    
+
     def reduce_energy(self, attack: str):
         self.energy -= AttackData.get(attack)['cost']
-    
+
     def get_base_damage(self, attack: str) -> int:
         return self.get_stat('attack') * AttackData.get(attack)['amount']
 
@@ -70,8 +129,3 @@ class Monster:
     def stat_limiter(self):
         self.health = max(0, min(self.health, self.get_stat('max_health')))
         self.energy = max(0, min(self.energy, self.get_stat('max_energy')))
-
-    def update(self, dt: float):
-        self.stat_limiter()
-        if not self.paused:
-            self.initiative += self.get_stat('speed') * dt
@@ -0,0 +1,72 @@
+import os
+import hashlib
+import pygame
+from support import get_path, create_outline_frames
+from typing import Dict, Iterator, List
+
+OUTLINE_FOLDER = ("data", "compiled", "outlines")
+
+
+class MonsterOutlines:
+    def __init__(self, monster_frames: Dict[str, Dict[str, List[pygame.Surface]]], width: int) -> None:
+        self.monster_frames = monster_frames
+        self.width = width
+        self.outlines: Dict[str, Dict[str, List[pygame.Surface]]] = {}
+
+    def __getitem__(self, monster: str) -> Dict[str, List[pygame.Surface]]:
+        if monster not in self.outlines:
+            self.outlines[monster] = self.load(monster)
+        return self.outlines[monster]
+
+    def __contains__(self, monster: str) -> bool:
+        return monster in self.monster_frames
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.monster_frames)
+
+    def get_cache_path(self, monster: str) -> str:
+        # keyed by the frame pixels, so a repainted monster never picks up a stale outline
+        digest = hashlib.sha1(f"{self.width}".encode())
+        for state, frames in self.monster_frames[monster].items():
+            digest.update(state.encode())
+            for frame in frames:
+                digest.update(f"{frame.get_size()}".encode())
+                digest.update(pygame.image.tobytes(frame, 'RGBA'))
+        return get_path(*OUTLINE_FOLDER, f"{monster}_{self.width}_{digest.hexdigest()[:16]}.png")
+
+    def load(self, monster: str) -> Dict[str, List[pygame.Surface]]:
+        frames = self.monster_frames[monster]
+        path = self.get_cache_path(monster)
+
+        # one row per state, one column per frame
+        if os.path.exists(path):
+            sheet = pygame.image.load(path).convert_alpha()
+            width, height = [size + self.width * 2 for size in next(iter(frames.values()))[0].get_size()]
+            return {
+                state: [sheet.subsurface(col * width, row * height, width, height) for col in range(len(state_frames))]
+                for row, (state, state_frames) in enumerate(frames.items())
+            }
+
+        outline_frames = create_outline_frames(frames, self.width)
+        self.save(path, outline_frames)
+        return outline_frames
+
+    def save(self, path: str, outline_frames: Dict[str, List[pygame.Surface]]) -> None:
+        width, height = next(iter(outline_frames.values()))[0].get_size()
+        cols = max(len(frames) for frames in outline_frames.values())
+        sheet = pygame.Surface((width * cols, height * len(outline_frames)), pygame.SRCALPHA)
+        sheet.fill((0, 0, 0, 0))
+        for row, frames in enumerate(outline_frames.values()):
+            for col, frame in enumerate(frames):
+                sheet.blit(frame, (col * width, row * height))
+
+        try:
+            folder, file_name = os.path.split(path)
+            os.makedirs(folder, exist_ok = True)
+            prefix = file_name.rsplit('_', 1)[0] + '_'
+            for old_file in os.listdir(folder):
+                if old_file.startswith(prefix):
+                    os.remove(os.path.join(folder, old_file))
+            pygame.image.save(sheet, path)
+        except (OSError, pygame.error):
+            pass  # read-only install, rebuild the outline next launch
@@ -0,0 +1,240 @@
+import os
+import sys
+import zlib
+import time
+import shutil
+import sqlite3
+import pickle
+import struct
+import hashlib
+import argparse
+import tempfile
+from controls import Controls
+from rng import RandomStreams, STREAMS
+from save_ import Save
+from settings import SIMULATION_RATE
+from storage import STORAGE_PATH
+from support import get_path
+from timer_ import TimerScheduler
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    from main import Game
+
+FORMAT_VERSION = 2
+MAGIC = b'PMREPLAY'
+# ticks between state hashes
+CHECKPOINT_INTERVAL = 60
+# tick, pressed keys, just pressed keys, written whenever the keys change
+INPUT_RECORD = struct.Struct('<IBB')
+
+
+# region state
+
+def get_state(game: 'Game') -> Tuple:
+    """Everything a replay has to reproduce, rounded so float noise below what the game can show does not count."""
+    player = game.player
+    state: List[Any] = [
+        game.map_name, round(player.rect.x, 3), round(player.rect.y, 3), player.facing_direction,
+        [(monster.name, monster.level, round(monster.xp, 3), round(monster.health, 3), round(monster.energy, 3)) for monster in game.player_monster.values()],
+        bool(game.dialog_tree), game.menu.is_open, bool(game.evolution)
+    ]
+    if game.battle:
+        engine = game.battle.engine
+        state.append((round(engine.clock, 4), engine.turns, engine.winner, [(combatant.side, combatant.pos_index, combatant.monster.name, round(combatant.monster.health, 3)) for combatant in engine.combatants()]))
+    state.append((game.storage.change, game.storage.count()))
+    state.append([RandomStreams().get(name).getstate() for name in STREAMS])
+    return tuple(state)
+
+def get_state_hash(game: 'Game') -> bytes:
+    return hashlib.sha1(repr(get_state(game)).encode()).digest()[:8]
+
+def snapshot_storage(path: str) -> Optional[bytes]:
+    # through the backup api, so a half written page of the live file is never copied
+    if not os.path.exists(path):
+        return None
+    with tempfile.TemporaryDirectory() as folder:
+        copy_path = os.path.join(folder, "storage.sqlite")
+        source, copy = sqlite3.connect(path), sqlite3.connect(copy_path)
+        try:
+            source.backup(copy)
+        finally:
+            source.close()
+            copy.close()
+        with open(copy_path, "rb") as f:
+            return f.read()
+
+# endregion
+
+# region sessions
+
+class Session:
+    """Runs the game one fixed tick per frame, with seeded random streams and timers on tick time."""
+    def __init__(self, seed: int, rate: int = SIMULATION_RATE, storage_path: Optional[str] = None) -> None:
+        self.seed = seed
+        self.rate = rate
+        self.step = 1 / rate
+        self.tick = 0
+        self.storage_path = storage_path
+
+        # before the game exists, it draws random numbers and starts timers while it sets up
+        RandomStreams().seed(seed)
+        TimerScheduler().set_time_source(self.get_time)
+
+    def get_time(self) -> int:
+        return self.tick * 1000 // self.rate
+
+    def begin_tick(self) -> None:
+        self.tick += 1
+        self.read_input()
+
+    def read_input(self) -> None:
+        pass
+
+    def end_tick(self, game: 'Game') -> bool:
+        return True
+
+
+class Recorder(Session):
+    def __init__(self, path: str, seed: int, rate: int = SIMULATION_RATE) -> None:
+        super().__init__(seed, rate)
+        self.path = path
+        # the game starts from both of these, the replay has to as well
+        with open(Save().path, "r", encoding = "utf-8") as f:
+            self.save_text = f.read()
+        self.storage = snapshot_storage(get_path(*STORAGE_PATH))
+        self.inputs = bytearray()
+        self.checkpoints: List[Tuple[int, bytes]] = []
+        self.keys = (0, 0)
+
+    def read_input(self) -> None:
+        # the game reads the recorded state too, so keys the recording leaves out cannot make a difference
+        keys = Controls().sample()
+        if keys != self.keys:
+            self.inputs += INPUT_RECORD.pack(self.tick, *keys)
+            self.keys = keys
+        Controls().set_state(*keys)
+
+    def end_tick(self, game: 'Game') -> bool:
+        if self.tick % CHECKPOINT_INTERVAL == 0:
+            self.checkpoints.append((self.tick, get_state_hash(game)))
+        return True
+
+    def write(self) -> None:
+        data = {
+            'seed': self.seed, 'rate': self.rate, 'ticks': self.tick, 'save': self.save_text, 'storage': self.storage,
+            'input': bytes(self.inputs), 'checkpoints': self.checkpoints
+        }
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC + bytes([FORMAT_VERSION]))
+            f.write(zlib.compress(pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+        os.replace(temp_path, self.path)
+
+
+class Replayer(Session):
+    def __init__(self, path: str) -> None:
+        data = read_recording(path)
+
+        # the game starts from the save the recording started from, and writes nothing outside a temp folder
+        self.folder = tempfile.mkdtemp(prefix = "replay_")
+        save_path = os.path.join(self.folder, "player.json")
+        with open(save_path, "w", encoding = "utf-8") as f:
+            f.write(data['save'])
+        save = Save()
+        save.path = save_path
+        save.autosave_interval = 0
+        save.load()
+
+        storage_path = os.path.join(self.folder, "storage.sqlite")
+        if data['storage'] is not None:
+            with open(storage_path, "wb") as f:
+                f.write(data['storage'])
+
+        super().__init__(data['seed'], data['rate'], storage_path)
+        self.ticks: int = data['ticks']
+        self.inputs = list(INPUT_RECORD.iter_unpack(data['input']))
+        self.next_input = 0
+        self.keys = (0, 0)
+        self.checkpoints: Dict[int, bytes] = dict(data['checkpoints'])
+        self.verified = 0
+        self.mismatch: Optional[int] = None
+
+    def read_input(self) -> None:
+        while self.next_input < len(self.inputs) and self.inputs[self.next_input][0] <= self.tick:
+            self.keys = self.inputs[self.next_input][1:]
+            self.next_input += 1
+        Controls().set_state(*self.keys)
+
+    def end_tick(self, game: 'Game') -> bool:
+        expected = self.checkpoints.get(self.tick)
+        if expected is not None:
+            if get_state_hash(game) != expected:
+                # everything after the first divergence is noise
+                self.mismatch = self.tick
+                return False
+            self.verified += 1
+        return self.tick < self.ticks
+
+    def cleanup(self, game: 'Game') -> None:
+        Save().flush(timeout = 5)
+        game.storage.close()
+        shutil.rmtree(self.folder, ignore_errors = True)
+
+
+def read_recording(path: str) -> Dict[str, Any]:
+    with open(path, "rb") as f:
+        header = f.read(len(MAGIC) + 1)
+        if header[:len(MAGIC)] != MAGIC or header[len(MAGIC)] != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} recording")
+        return pickle.loads(zlib.decompress(f.read()))
+
+# endregion
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description = "Record a play session's input, or replay one headless and check it plays out the same.")
+    subparsers = parser.add_subparsers(dest = "command", required = True)
+    record_parser = subparsers.add_parser("record", help = "play normally and write the input to a recording on quit")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--seed", type = int, default = None)
+    play_parser = subparsers.add_parser("play", help = "replay a recording as fast as possible")
+    play_parser.add_argument("path")
+    play_parser.add_argument("--window", action = "store_true", help = "show the replay at normal speed instead of headless")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        from main import Game
+        seed = args.seed if args.seed is not None else int.from_bytes(os.urandom(4), 'little')
+        recorder = Recorder(args.path, seed)
+        game = Game(recorder)
+        # quitting leaves run through sys.exit, and a crash is what a recording is most wanted for
+        try:
+            game.run()
+        finally:
+            recorder.write()
+        return
+
+    if not args.window:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
+    from main import Game
+    replayer = Replayer(args.path)
+    game = Game(replayer)
+    if not args.window:
+        game.target_fps = 0
+
+    start = time.perf_counter()
+    try:
+        game.run()
+    finally:
+        replayer.cleanup(game)
+    duration = time.perf_counter() - start
+
+    print(f"{replayer.tick}/{replayer.ticks} ticks in {duration:.2f}s ({replayer.tick / duration:.0f} ticks/s), {replayer.verified} checkpoints verified")
+    if replayer.mismatch is not None:
+        sys.exit(f"state diverged from the recording at tick {replayer.mismatch}")
+
+
+if __name__ == "__main__":
+    main()
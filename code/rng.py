@@ -0,0 +1,23 @@
+import random
+from singleton import SingletonMeta
+from typing import Dict, Optional
+
+# one generator per subsystem, so extra draws in one of them leave the others untouched
+STREAMS = ('world', 'entities', 'sprites', 'monster', 'battle')
+
+
+class RandomStreams(metaclass=SingletonMeta):
+    def __init__(self) -> None:
+        self.streams: Dict[str, random.Random] = {}
+        self.seed(None)
+
+    def seed(self, seed: Optional[int]) -> None:
+        # without a seed every stream starts from system entropy, like the module level functions
+        self.streams = {name: random.Random(f"{seed}:{name}" if seed is not None else None) for name in STREAMS}
+
+    def get(self, name: str) -> random.Random:
+        return self.streams[name]
+
+
+def get_stream(name: str) -> random.Random:
+    return RandomStreams().get(name)
@@ -1,17 +1,112 @@
 import os
 import json
+import time
+from threading import Condition, Thread
 from singleton import SingletonMeta
 from support import get_path
-from typing import Optional, Any
+from settings import AUTOSAVE_INTERVAL
+from typing import Any, Callable, Dict, Optional, Set
+
+# top level keys of the save file the game keeps up to date
+SECTIONS = ('team', 'encyclopedia', 'position', 'defeated_trainers', 'storage')
+
 
 class Save(metaclass=SingletonMeta):
+    """
+    The player save file.
+
+    Owners of saved state register a snapshot function per section and mark the section dirty
+    when it changes. save takes the snapshots on the calling thread, which only copies plain
+    values, and hands them to a writer thread that serializes them and swaps the file in with
+    os.replace. Saves requested while a write is running are merged into one follow-up write.
+    """
     def __init__(self):
+        self.path = get_path("save", "player.json")
+        self.snapshots: Dict[str, Callable[[], Any]] = {}
+        self.dirty: Set[str] = set()
+        self.autosave_interval = AUTOSAVE_INTERVAL
+        self.last_save = time.monotonic()
+
+        # writer thread state, guarded by condition
+        self.condition = Condition()
+        self.pending: Optional[Dict[str, Any]] = None
+        self.writing = False
+        self.writer: Optional[Thread] = None
+        self.last_error: Optional[Exception] = None
         self.load()
 
     def load(self):
-        with open(get_path("save", "player.json"), "r", encoding="utf-8") as f:
+        with open(self.path, "r", encoding="utf-8") as f:
             self._data = json.load(f)
 
     def get(self, key: str, default: Optional[Any] = None):
-        return self._data.get(key)
-        
\ No newline at end of file
+        return self._data.get(key, default)
+
+    # tracking
+    def register(self, section: str, snapshot: Callable[[], Any]) -> None:
+        self.snapshots[section] = snapshot
+
+    def mark_dirty(self, *sections: str) -> None:
+        self.dirty.update(sections)
+
+    def update(self) -> None:
+        # once per frame, costs a clock read unless an autosave is due
+        if self.autosave_interval and self.dirty and time.monotonic() - self.last_save >= self.autosave_interval:
+            self.save()
+
+    # writing
+    def save(self, full: bool = False) -> None:
+        """Snapshots the dirty sections, or every registered one with full, and queues a write."""
+        sections = set(self.snapshots) if full else self.dirty & set(self.snapshots)
+        self.dirty.clear()
+        self.last_save = time.monotonic()
+        if not sections:
+            return
+
+        # new top level values only, the writer thread may still be reading the previous ones
+        data = dict(self._data)
+        for section in sections:
+            data[section] = self.snapshots[section]()
+        self._data = data
+
+        with self.condition:
+            self.pending = data
+            if self.writer is None:
+                self.writer = Thread(target = self.write_loop, name = "save writer", daemon = True)
+                self.writer.start()
+            self.condition.notify()
+
+    def write_loop(self) -> None:
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                data, self.pending = self.pending, None
+                self.writing = True
+
+            try:
+                self.write(data)
+                self.last_error = None
+            except Exception as e:
+                # a value json cannot encode fails here too, and the thread has to outlive it
+                self.last_error = e
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.condition.notify_all()
+
+    def write(self, data: Dict[str, Any]) -> None:
+        # indented output goes through the pure python encoder, which lets the game thread
+        # run in between, the C encoder would hold the GIL for the whole dump
+        text = json.dumps(data, indent = 4)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding = "utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits for queued writes to land, for quitting. Returns False on timeout."""
+        with self.condition:
+            return self.condition.wait_for(lambda: self.pending is None and not self.writing, timeout)
@@ -5,6 +5,43 @@ TILE_SIZE = 64
 ANIMATION_SPEED = 6
 BATTLE_OUTLINE_WIDTH = 4
 
+# static 'Terrain' / 'Terrain Top' tiles are pre-rendered into square chunks of this many tiles
+BAKE_TERRAIN = True
+TERRAIN_CHUNK_SIZE = 16
+
+# cell size in pixels of the uniform grid AllSprites uses to find on-screen sprites
+SPATIAL_CELL_SIZE = TILE_SIZE * 4
+
+# approximate bytes of tile images the map manager keeps parsed maps for
+MAP_CACHE_BUDGET = 64 * 1024 * 1024
+
+# bytes of flipped / grayscale / silhouette / scaled surfaces kept by the surface cache
+SURFACE_CACHE_BUDGET = 32 * 1024 * 1024
+
+# rendered strings kept by the text cache
+TEXT_CACHE_SIZE = 512
+
+# rendered rows kept by each scrolling list
+LIST_ROW_CACHE_SIZE = 64
+
+# push only the changed screen areas to the display while a battle is idle
+DIRTY_RECT_UPDATES = True
+
+# seconds between background saves of whatever changed, 0 turns autosave off
+AUTOSAVE_INTERVAL = 60
+
+# run the world at a fixed rate and interpolate drawing between steps, at most this many steps per rendered frame,
+# further behind, frames go undrawn until it has caught up, but never more than this many in a row
+FIXED_TIMESTEP = False
+SIMULATION_RATE = 60
+MAX_SIMULATION_STEPS = 5
+MAX_SKIPPED_FRAMES = 5
+
+# monsters past the team size go to storage after a battle, storage boxes hold this many and the last few are kept loaded
+MAX_TEAM_SIZE = 8
+STORAGE_BOX_SIZE = 30
+STORAGE_CACHED_BOXES = 4
+
 COLORS = {
 	'white': '#f4fefa', 
 	'pure white': '#ffffff',
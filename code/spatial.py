@@ -0,0 +1,55 @@
+import pygame
+from typing import Dict, Hashable, List, Set, Tuple, Union
+
+RectLike = Union[pygame.Rect, pygame.FRect]
+
+
+class SpatialGrid:
+    def __init__(self, cell_size: int) -> None:
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Set[Hashable]] = {}
+        self.item_cells: Dict[Hashable, List[Tuple[int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.item_cells)
+
+    def __contains__(self, item: Hashable) -> bool:
+        return item in self.item_cells
+
+    def get_cells(self, rect: RectLike) -> List[Tuple[int, int]]:
+        left, top = int(rect.left // self.cell_size), int(rect.top // self.cell_size)
+        right, bottom = int(rect.right // self.cell_size), int(rect.bottom // self.cell_size)
+        return [(col, row) for col in range(left, right + 1) for row in range(top, bottom + 1)]
+
+    def insert(self, item: Hashable, rect: RectLike) -> None:
+        if item in self.item_cells:
+            self.remove(item)
+
+        cells = self.get_cells(rect)
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(item)
+        self.item_cells[item] = cells
+
+    def remove(self, item: Hashable) -> None:
+        for cell in self.item_cells.pop(item, ()):
+            items = self.cells[cell]
+            items.discard(item)
+            if not items:
+                del self.cells[cell]
+
+    def move(self, item: Hashable, rect: RectLike) -> None:
+        # only touch the buckets when the item actually crossed a cell border
+        if self.item_cells.get(item) != self.get_cells(rect):
+            self.insert(item, rect)
+
+    def query(self, rect: RectLike) -> Set[Hashable]:
+        found = set()
+        for cell in self.get_cells(rect):
+            items = self.cells.get(cell)
+            if items:
+                found.update(items)
+        return found
+
+    def clear(self) -> None:
+        self.cells.clear()
+        self.item_cells.clear()
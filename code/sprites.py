@@ -1,11 +1,13 @@
 import pygame
 from settings import *
-from typing import Tuple, List, Dict, Callable
+from typing import Tuple, List, Dict, Callable, Optional
 from types_utils import GroupsArgument
-from monster import Monster
-from random import uniform
-from support import draw_bar
+from battle_engine import Combatant
+from rng import get_stream
+from support import draw_bar, bar_state
 from timer_ import Timer
+from surface_cache import silhouette
+from text_cache import render_text
 
 # region overworld sprites
 
@@ -19,6 +21,11 @@ class Sprite(pygame.sprite.Sprite):
         self.hitbox = self.rect.copy()
 
 
+class TerrainChunkSprite(Sprite):
+    def __init__(self, pos: Tuple[float, float], surf: pygame.Surface, groups: GroupsArgument):
+        super().__init__(pos, surf, groups, WORLD_LAYERS['bg'])
+
+
 class BorderSprite(Sprite):
     def __init__(self, pos: Tuple[float, float], surf: pygame.Surface, groups: GroupsArgument):
         super().__init__(pos, surf, groups)
@@ -65,17 +72,18 @@ class AnimatedSprite(Sprite):
 # region battle sprites
 
 class MonsterSprite(pygame.sprite.Sprite):
-    def __init__(self, pos: Tuple[float, float], frames: Dict[str, List[pygame.Surface]], groups: GroupsArgument, monster: Monster, index: int, pos_index: int, entity: str, apply_attack: Callable[['MonsterSprite', str, int], None], create_monster: Callable[[Monster, int, int, str], None]):
+    def __init__(self, pos: Tuple[float, float], frames: Dict[str, List[pygame.Surface]], groups: GroupsArgument, combatant: Combatant, apply_attack: Callable[['MonsterSprite', str], None], create_monster: Callable[[Combatant], None]):
         # data
-        self.index = index
-        self.pos_index = pos_index
-        self.entity = entity
-        self.monster = monster
+        self.combatant = combatant
+        self.index = combatant.index
+        self.pos_index = combatant.pos_index
+        self.entity = combatant.side
+        self.monster = combatant.monster
         self.frame_index = 0
         self.adjusted_frame_index = 0
         self.frames = frames
         self.state = 'idle'
-        self.animation_speed = ANIMATION_SPEED + uniform(-1, 1)
+        self.animation_speed = ANIMATION_SPEED + get_stream('sprites').uniform(-1, 1)
         self.z = BATTLE_LAYERS['monster']
         self.highlight = False
         self.target_sprite = None
@@ -98,16 +106,14 @@ class MonsterSprite(pygame.sprite.Sprite):
         self.frame_index += ANIMATION_SPEED * dt
         if self.state == 'attack' and self.frame_index >= len(self.frames['attack']):
             # apply attack
-            self.apply_attack(self.target_sprite, self.current_attack, self.monster.get_base_damage(self.current_attack))
+            self.apply_attack(self.target_sprite, self.current_attack)
             self.state = 'idle'
 
         self.adjusted_frame_index = int(self.frame_index % len(self.frames[self.state]))
         self.image = self.frames[self.state][self.adjusted_frame_index]
 
         if self.highlight:
-            white_surf = pygame.mask.from_surface(self.image).to_surface()
-            white_surf.set_colorkey('black')
-            self.image = white_surf
+            self.image = silhouette(self.image)
 
     def set_highlight(self, value: bool):
         self.highlight = value
@@ -119,23 +125,25 @@ class MonsterSprite(pygame.sprite.Sprite):
         self.frame_index = 0
         self.target_sprite = target_sprite
         self.current_attack = attack
-        self.monster.reduce_energy(attack)
 
-    def delayed_kill(self, new_monster):
+    def delayed_kill(self, new_combatant: Optional[Combatant]):
         if not self.timers['kill'].active:
-            self.next_monster_data = new_monster
+            self.next_monster_data = new_combatant
             self.timers['kill'].activate()
 
     def destroy(self):
         if self.next_monster_data:
-            self.create_monster(*self.next_monster_data)
+            self.create_monster(self.next_monster_data)
         self.kill()
 
-    def update(self, dt: float):
+    def kill(self):
+        # the scheduler would still call back into a sprite that is gone
         for timer in self.timers.values():
-            timer.update()
+            timer.cancel()
+        super().kill()
+
+    def update(self, dt: float):
         self.animate(dt)
-        self.monster.update(dt)
 
 
 class MonsterOutlineSprite(pygame.sprite.Sprite):
@@ -184,37 +192,68 @@ class MonsterLevelSprite(pygame.sprite.Sprite):
         self.image = pygame.Surface((60, 26))
         self.rect = self.image.get_frect(topleft = pos) if entity == 'player' else self.image.get_frect(topright = pos)
         self.xp_rect = pygame.FRect(0, self.rect.height - 2, self.rect.width, 2)
+        self.rendered_state = None
+        self.dirty = False
 
     def update(self, _):
-        self.image.fill(COLORS['white'])
+        monster = self.monster_sprite.monster
+        state = (monster.level, bar_state(self.xp_rect.width, monster.xp, monster.level_up))
+        self.dirty = state != self.rendered_state
+        if self.dirty:
+            self.rendered_state = state
+            self.image.fill(COLORS['white'])
 
-        text_surf = self.font.render(f"Lvl {self.monster_sprite.monster.level}", False, COLORS['black'])
-        text_rect = text_surf.get_frect(center = (self.rect.width / 2, self.rect.height / 2))
-        self.image.blit(text_surf, text_rect)
+            text_surf = render_text(self.font, f"Lvl {monster.level}", False, COLORS['black'])
+            text_rect = text_surf.get_frect(center = (self.rect.width / 2, self.rect.height / 2))
+            self.image.blit(text_surf, text_rect)
 
-        draw_bar(self.image, self.xp_rect, self.monster_sprite.monster.xp, self.monster_sprite.monster.level_up, COLORS['black'], COLORS['white'])
+            draw_bar(self.image, self.xp_rect, monster.xp, monster.level_up, COLORS['black'], COLORS['white'])
 
         if not self.monster_sprite.groups():
             self.kill()
 
 
 class MonsterStatsSprite(pygame.sprite.Sprite):
-    def __init__(self, pos: Tuple[float, float], monster_sprite: MonsterSprite, size: Tuple[float, float], groups: GroupsArgument, font: pygame.font.Font):
+    def __init__(self, pos: Tuple[float, float], monster_sprite: MonsterSprite, size: Tuple[float, float], groups: GroupsArgument, font: pygame.font.Font, get_initiative: Callable[[Combatant], float]):
         super().__init__(groups)
         self.monster_sprite = monster_sprite
+        # the engine keeps initiative as a turn time, the bar asks for the value at the current clock
+        self.get_initiative = get_initiative
         self.image = pygame.Surface(size)
         self.rect = self.image.get_frect(midbottom = pos)
         self.font = font
         self.z = BATTLE_LAYERS['overlay']
+        self.rendered_state = None
+        self.dirty = False
+
+    def get_state(self, info) -> Tuple:
+        (health, max_health), (energy, max_energy), (initiative, max_initiative) = info
+        return (
+            int(health), max_health, bar_state(self.rect.width * 0.9, health, max_health),
+            int(energy), max_energy, bar_state(self.rect.width * 0.9, energy, max_energy),
+            bar_state(self.rect.width, initiative, max_initiative)
+        )
 
     def update(self, _):
+        health, energy, _ = self.monster_sprite.monster.get_info()
+        info = (health, energy, (self.get_initiative(self.monster_sprite.combatant), 100))
+        state = self.get_state(info)
+        self.dirty = state != self.rendered_state
+        if self.dirty:
+            self.rendered_state = state
+            self.render(info)
+
+        if not self.monster_sprite.groups():
+            self.kill()
+
+    def render(self, info) -> None:
         self.image.fill(COLORS['white'])
 
-        for index, (value, max_value) in enumerate(self.monster_sprite.monster.get_info()):
+        for index, (value, max_value) in enumerate(info):
             color = (COLORS['red'], COLORS['blue'], COLORS['gray'])[index]
 
             if index < 2: # health and energy
-                text_surf = self.font.render(f'{int(value)}/{max_value}', False, COLORS['black'])
+                text_surf = render_text(self.font, f'{int(value)}/{max_value}', False, COLORS['black'])
                 text_rect = text_surf.get_frect(topleft = (self.rect.width * 0.05, index * self.rect.height / 2))
                 bar_rect = pygame.FRect(text_rect.bottomleft + pygame.Vector2(0, -2), (self.rect.width * 0.9, 4))
 
@@ -224,9 +263,6 @@ class MonsterStatsSprite(pygame.sprite.Sprite):
                 init_rect = pygame.FRect((0, self.rect.height - 2), (self.rect.width, 2))
                 draw_bar(self.image, init_rect, value, max_value, color, COLORS['white'], 0)
 
-        if not self.monster_sprite.groups():
-            self.kill()
-
 
 class AttackSprite(AnimatedSprite):
     def __init__(self, pos: Tuple[float, float], frames: List[pygame.Surface], groups: GroupsArgument):
@@ -250,7 +286,8 @@ class TimedSprite(Sprite):
         self.rect.center = pos
         self.death_timer = Timer(duration, autostart=True, func=self.kill)
 
-    def update(self, _):
-        self.death_timer.update()
+    def kill(self):
+        self.death_timer.cancel()
+        super().kill()
 
 # endregion
\ No newline at end of file
@@ -0,0 +1,175 @@
+import sqlite3
+from heapq import heapify, heappop, heappush
+from collections import OrderedDict
+from monster import Monster
+from settings import *
+from support import get_path
+from typing import List, NamedTuple, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS monsters (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    xp REAL NOT NULL,
+    element TEXT NOT NULL,
+    deposited INTEGER NOT NULL DEFAULT 0,
+    withdrawn INTEGER
+);
+CREATE INDEX IF NOT EXISTS monsters_name ON monsters (name, level);
+CREATE INDEX IF NOT EXISTS monsters_level ON monsters (level);
+CREATE INDEX IF NOT EXISTS monsters_element ON monsters (element, level);
+"""
+# columns added since the first storage files, with what existing rows get
+MIGRATIONS = (
+    ("deposited", "ALTER TABLE monsters ADD COLUMN deposited INTEGER NOT NULL DEFAULT 0"),
+    ("withdrawn", "ALTER TABLE monsters ADD COLUMN withdrawn INTEGER")
+)
+COLUMNS = "id, position, name, level, xp, element"
+STORAGE_PATH = ("save", "storage.sqlite")
+
+
+class StoredMonster(NamedTuple):
+    id: int
+    position: int
+    name: str
+    level: int
+    xp: float
+    element: str
+
+
+class MonsterStorage:
+    """
+    Caught monsters that are not in the team, kept in an sqlite file instead of memory.
+
+    Monsters sit at a position, and every STORAGE_BOX_SIZE positions make a box. Boxes are only
+    turned into Monster objects when asked for and the last few are kept in an LRU, queries
+    return plain rows.
+
+    The team lives in the save file, so a deposit or withdraw is only half of a move until the
+    save with the new team lands. Every change gets a number, the save stores the last one it
+    has seen as its 'storage' section, and reconcile undoes the newer ones on the next start.
+    Withdrawn rows stay until then, marked, so they can come back.
+    """
+    def __init__(self, path: Optional[str] = None, box_size: int = STORAGE_BOX_SIZE, cached_boxes: int = STORAGE_CACHED_BOXES) -> None:
+        self.path = path or get_path(*STORAGE_PATH)
+        self.box_size = box_size
+        self.cached_boxes = cached_boxes
+        # box -> [(id, monster)]
+        self.boxes: OrderedDict[int, List[Tuple[int, Monster]]] = OrderedDict()
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(monsters)")}
+        with self.connection:
+            for column, statement in MIGRATIONS:
+                if column not in columns:
+                    self.connection.execute(statement)
+
+        self.change = self.connection.execute("SELECT MAX(MAX(deposited), COALESCE(MAX(withdrawn), 0)) FROM monsters").fetchone()[0] or 0
+        self.load_positions()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def load_positions(self) -> None:
+        # gaps left by withdrawn monsters are filled first, found once here instead of per deposit
+        positions = [row[0] for row in self.connection.execute("SELECT position FROM monsters ORDER BY position")]
+        self.next_position = positions[-1] + 1 if positions else 0
+        taken = set(positions)
+        self.free_positions = [position for position in range(self.next_position) if position not in taken]
+        heapify(self.free_positions)
+
+    def reconcile(self, saved_change: Optional[int]) -> None:
+        """Rolls back the changes after saved_change, the last one the save file has. None keeps every change."""
+        if saved_change is None:
+            saved_change = self.change
+        with self.connection:
+            # the saved team still has these
+            self.connection.execute("DELETE FROM monsters WHERE deposited > ?", (saved_change,))
+            # and never got these
+            self.connection.execute("UPDATE monsters SET withdrawn = NULL WHERE withdrawn > ?", (saved_change,))
+            self.connection.execute("DELETE FROM monsters WHERE withdrawn IS NOT NULL")
+        self.change = saved_change
+        self.boxes.clear()
+        self.load_positions()
+
+    # changes
+    def get_free_position(self) -> int:
+        if self.free_positions:
+            return heappop(self.free_positions)
+        self.next_position += 1
+        return self.next_position - 1
+
+    def deposit(self, monsters: List[Monster]) -> List[int]:
+        ids = []
+        self.change += 1
+        with self.connection:
+            for monster in monsters:
+                position = self.get_free_position()
+                cursor = self.connection.execute(
+                    "INSERT INTO monsters (position, name, level, xp, element, deposited) VALUES (?, ?, ?, ?, ?, ?)",
+                    (position, monster.name, monster.level, monster.xp, monster.element, self.change)
+                )
+                ids.append(cursor.lastrowid)
+                self.boxes.pop(position // self.box_size, None)
+        return ids
+
+    def withdraw(self, id: int) -> Monster:
+        row = self.get(id)
+        if row is None:
+            raise KeyError(f"No stored monster {id}")
+        # the row and its position are freed by reconcile once the save has the monster
+        self.change += 1
+        with self.connection:
+            self.connection.execute("UPDATE monsters SET withdrawn = ? WHERE id = ?", (self.change, id))
+        self.boxes.pop(row.position // self.box_size, None)
+        return self.create_monster(row)
+
+    # reading
+    @staticmethod
+    def create_monster(row: StoredMonster) -> Monster:
+        monster = Monster(row.name, row.level)
+        monster.xp = row.xp
+        return monster
+
+    def get(self, id: int) -> Optional[StoredMonster]:
+        row = self.connection.execute(f"SELECT {COLUMNS} FROM monsters WHERE id = ? AND withdrawn IS NULL", (id,)).fetchone()
+        return StoredMonster(*row) if row else None
+
+    def get_box(self, box: int) -> List[Tuple[int, Monster]]:
+        if box in self.boxes:
+            self.boxes.move_to_end(box)
+            return self.boxes[box]
+
+        start = box * self.box_size
+        rows = self.connection.execute(
+            f"SELECT {COLUMNS} FROM monsters WHERE position >= ? AND position < ? AND withdrawn IS NULL ORDER BY position",
+            (start, start + self.box_size)
+        ).fetchall()
+        self.boxes[box] = [(row[0], self.create_monster(StoredMonster(*row))) for row in rows]
+        if len(self.boxes) > self.cached_boxes:
+            self.boxes.popitem(last = False)
+        return self.boxes[box]
+
+    def get_box_count(self) -> int:
+        last = self.connection.execute("SELECT MAX(position) FROM monsters WHERE withdrawn IS NULL").fetchone()[0]
+        return 0 if last is None else last // self.box_size + 1
+
+    def count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM monsters WHERE withdrawn IS NULL").fetchone()[0]
+
+    def find(self, name: Optional[str] = None, element: Optional[str] = None, min_level: Optional[int] = None, max_level: Optional[int] = None, limit: Optional[int] = None) -> List[StoredMonster]:
+        conditions, params = ["withdrawn IS NULL"], []
+        for condition, value in (("name = ?", name), ("element = ?", element), ("level >= ?", min_level), ("level <= ?", max_level)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+
+        query = f"SELECT {COLUMNS} FROM monsters WHERE " + " AND ".join(conditions)
+        query += " ORDER BY level DESC, position"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        return [StoredMonster(*row) for row in self.connection.execute(query, params)]
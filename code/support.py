@@ -3,24 +3,32 @@ from settings import *
 from os.path import join
 from os import walk
 from pytmx.util_pygame import load_pygame
-from typing import TYPE_CHECKING, List, Dict
+from typing import TYPE_CHECKING, List, Dict, Tuple
 
 if TYPE_CHECKING:
 	from entities import Entity
 
 # region imports
  
+def load_surface(full_path, alpha = True):
+	# packed images come out of the atlas as subsurfaces, anything else is read from disk
+	from atlas import Atlas
+	surf = Atlas().get(full_path)
+	if surf is None:
+		surf = pygame.image.load(full_path)
+		return surf.convert_alpha() if alpha else surf.convert()
+	return surf if alpha else surf.convert()
+
 def import_image(*path, alpha = True, format = 'png'):
 	full_path = get_path(*path) + f'.{format}'
-	surf = pygame.image.load(full_path).convert_alpha() if alpha else pygame.image.load(full_path).convert()
-	return surf
+	return load_surface(full_path, alpha)
 
 def import_folder(*path):
 	frames = []
 	for folder_path, sub_folders, image_names in walk(get_path(*path)):
 		for image_name in sorted(image_names, key = lambda name: int(name.split('.')[0])):
 			full_path = get_path(folder_path, image_name)
-			surf = pygame.image.load(full_path).convert_alpha()
+			surf = load_surface(full_path)
 			frames.append(surf)
 	return frames
 
@@ -29,7 +37,7 @@ def import_folder_dict(*path):
 	for folder_path, sub_folders, image_names in walk(get_path(*path)):
 		for image_name in image_names:
 			full_path = get_path(folder_path, image_name)
-			surf = pygame.image.load(full_path).convert_alpha()
+			surf = load_surface(full_path)
 			frames[image_name.split('.')[0]] = surf
 	return frames
 
@@ -48,11 +56,7 @@ def import_tilemap(cols, rows, *path):
 	for col in range(cols):
 		for row in range(rows):
 			cutout_rect = pygame.Rect(col * cell_width, row * cell_height,cell_width,cell_height)
-			cutout_surf = pygame.Surface((cell_width, cell_height))
-			cutout_surf.fill('green')
-			cutout_surf.set_colorkey('green')
-			cutout_surf.blit(surf, (0,0), cutout_rect)
-			frames[(col, row)] = cutout_surf
+			frames[(col, row)] = surf.subsurface(cutout_rect)
 	return frames
 
 def character_importer(cols, rows, *path):
@@ -104,30 +108,28 @@ def monster_importer(cols, rows, *path):
 				monster_dict[image_name][key] = [frame_dict[(col, row)] for col in range(cols)]
 	return monster_dict
 
-def outline_creator(frame_dict: Dict[str, Dict[str, pygame.Surface]], width: int):
-	outline_frame_dict = {}
-	for monster, monster_frames in frame_dict.items():
-		outline_frame_dict[monster] = {}
-		for state, frames in monster_frames.items():
-			outline_frame_dict[monster][state] = []
-			for frame in frames:
-				new_surf = pygame.Surface(pygame.Vector2(frame.get_size()) + pygame.Vector2(width * 2), pygame.SRCALPHA)
-				new_surf.fill((0, 0, 0, 0))
-				white_frame = pygame.mask.from_surface(frame).to_surface()
-				white_frame.set_colorkey('black')
-
-				new_surf.blit(white_frame, (0, 0))
-				new_surf.blit(white_frame, (width, 0))
-				new_surf.blit(white_frame, (width * 2, 0))
-				new_surf.blit(white_frame, (width * 2, width))
-				new_surf.blit(white_frame, (width * 2, width * 2))
-				new_surf.blit(white_frame, (width, width * 2))
-				new_surf.blit(white_frame, (0, width * 2))
-				new_surf.blit(white_frame, (0, width))
-
-				outline_frame_dict[monster][state].append(new_surf)
-
-	return outline_frame_dict
+def create_outline_frames(monster_frames: Dict[str, List[pygame.Surface]], width: int) -> Dict[str, List[pygame.Surface]]:
+	outline_frames = {}
+	for state, frames in monster_frames.items():
+		outline_frames[state] = []
+		for frame in frames:
+			new_surf = pygame.Surface(pygame.Vector2(frame.get_size()) + pygame.Vector2(width * 2), pygame.SRCALPHA)
+			new_surf.fill((0, 0, 0, 0))
+			white_frame = pygame.mask.from_surface(frame).to_surface()
+			white_frame.set_colorkey('black')
+
+			new_surf.blit(white_frame, (0, 0))
+			new_surf.blit(white_frame, (width, 0))
+			new_surf.blit(white_frame, (width * 2, 0))
+			new_surf.blit(white_frame, (width * 2, width))
+			new_surf.blit(white_frame, (width * 2, width * 2))
+			new_surf.blit(white_frame, (width, width * 2))
+			new_surf.blit(white_frame, (0, width * 2))
+			new_surf.blit(white_frame, (0, width))
+
+			outline_frames[state].append(new_surf)
+
+	return outline_frames
 
 def attack_importer(*path):
 	attack_dict = {}
@@ -150,14 +152,32 @@ def audio_importer(*path):
 
 # region game
 
+def bar_progress(width: float, value: float, max_value: float) -> float:
+	return max(0, min(width, value * width / max_value))
+
+def bar_state(width: float, value: float, max_value: float) -> int:
+	# half-pixel steps, so a change is caught whether the fill edge is truncated or rounded
+	return int(bar_progress(width, value, max_value) * 2)
+
 def draw_bar(surface: pygame.Surface, rect: pygame.FRect, value: float, max_value: float, color: str, bg_color: str, radius: int = 1):
-	ratio = rect.width / max_value
 	bg_rect = rect.copy()
-	progress = max(0, min(rect.width, value * ratio))
+	progress = bar_progress(rect.width, value, max_value)
 	progress_rect = pygame.FRect(rect.topleft, (progress, rect.height))
 	pygame.draw.rect(surface, bg_color, bg_rect, 0, radius)
 	pygame.draw.rect(surface, color, progress_rect, 0, radius)
 
+def bake_tile_layers(tmx_map, layer_names: List[str], chunk_size: int) -> Dict[Tuple[int, int], pygame.Surface]:
+	chunk_pixels = chunk_size * TILE_SIZE
+	chunks = {}
+	for layer_name in layer_names:
+		for x, y, surf in tmx_map.get_layer_by_name(layer_name).tiles():
+			key = (x // chunk_size, y // chunk_size)
+			if key not in chunks:
+				chunks[key] = pygame.Surface((chunk_pixels, chunk_pixels), pygame.SRCALPHA)
+			chunks[key].blit(surf, ((x % chunk_size) * TILE_SIZE, (y % chunk_size) * TILE_SIZE))
+
+	return {(col * chunk_pixels, row * chunk_pixels): surf.convert_alpha() for (col, row), surf in chunks.items()}
+
 def check_connections(radius: int, entity: 'Entity', target: 'Entity', tolerance: int = 30):
 	relation = pygame.math.Vector2(target.rect.center) - pygame.math.Vector2(entity.rect.center)
 	if relation.length() < radius:
@@ -0,0 +1,59 @@
+import pygame
+from collections import OrderedDict
+from settings import *
+from singleton import SingletonMeta
+from typing import Callable, Dict, Hashable, Tuple
+
+
+def create_silhouette(surf: pygame.Surface) -> pygame.Surface:
+    white_surf = pygame.mask.from_surface(surf).to_surface()
+    white_surf.set_colorkey('black')
+    return white_surf
+
+
+TRANSFORMS: Dict[str, Callable[..., pygame.Surface]] = {
+    'flip': pygame.transform.flip,
+    'grayscale': pygame.transform.grayscale,
+    'silhouette': create_silhouette,
+    'scale2x': pygame.transform.scale2x
+}
+
+
+class SurfaceCache(metaclass=SingletonMeta):
+    def __init__(self, budget: int = SURFACE_CACHE_BUDGET) -> None:
+        self.budget = budget
+        self.used = 0
+        # key -> (source, derived surface, bytes); the source is kept so its id cannot be reused while cached
+        self.entries: OrderedDict[Tuple[int, str, Tuple[Hashable, ...]], Tuple[pygame.Surface, pygame.Surface, int]] = OrderedDict()
+
+    def get(self, surf: pygame.Surface, transform: str, *args: Hashable) -> pygame.Surface:
+        key = (id(surf), transform, args)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            return entry[1]
+
+        derived = TRANSFORMS[transform](surf, *args)
+        size = derived.get_width() * derived.get_height() * derived.get_bytesize()
+        self.entries[key] = (surf, derived, size)
+        self.used += size
+        while self.used > self.budget and len(self.entries) > 1:
+            self.used -= self.entries.popitem(last = False)[1][2]
+        return derived
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.used = 0
+
+
+def flipped(surf: pygame.Surface, flip_x: bool, flip_y: bool) -> pygame.Surface:
+    return SurfaceCache().get(surf, 'flip', flip_x, flip_y)
+
+def grayscale(surf: pygame.Surface) -> pygame.Surface:
+    return SurfaceCache().get(surf, 'grayscale')
+
+def silhouette(surf: pygame.Surface) -> pygame.Surface:
+    return SurfaceCache().get(surf, 'silhouette')
+
+def scaled2x(surf: pygame.Surface) -> pygame.Surface:
+    return SurfaceCache().get(surf, 'scale2x')
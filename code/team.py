@@ -3,7 +3,11 @@ from monster import Monster
 from support import draw_bar
 from settings import *
 from game_data import MonsterData, AttackData
-from typing import Dict
+from typing import Dict, Optional, Tuple
+from text_cache import render_text
+from save_ import Save
+from virtual_list import VirtualList
+from controls import get_just_pressed
 
 
 class Team:
@@ -33,23 +37,15 @@ class Team:
         self.item_height = self.main_rect.height / self.visible_items
         self.index = 0
         self.selected_index = None
+        self.list = VirtualList(self.list_width, self.item_height, self.visible_items)
 
-        # max values
-        self.max_stats = {}
-        for monster in self.monsters.values():
-            data = MonsterData.get(monster.name)
-            for stat, value in data['stats'].items():
-                if stat != 'element':
-                    if stat not in self.max_stats:
-                        self.max_stats[stat] = value
-                    else:
-                        self.max_stats[stat] = value if value > self.max_stats[stat] else self.max_stats[stat]
-
+        # max values, bars are scaled against the strongest monster in the dex
+        self.max_stats = MonsterData.get_max_stats()
         self.max_stats['health'] = self.max_stats.pop('max_health')
         self.max_stats['energy'] = self.max_stats.pop('max_energy')
 
     def input(self) -> None:
-        keys = pygame.key.get_just_pressed()
+        keys = get_just_pressed()
         if keys[pygame.K_UP]:
             self.index -= 1
         if keys[pygame.K_DOWN]:
@@ -61,6 +57,7 @@ class Team:
                 self.monsters[self.index] = selected_monster
                 self.monsters[self.selected_index] = current_monster
                 self.selected_index = None
+                Save().mark_dirty('team')
             else:
                 self.selected_index = self.index
 
@@ -70,32 +67,8 @@ class Team:
         bg_rect = pygame.FRect(self.main_rect.topleft, (self.list_width, self.main_rect.height))
         pygame.draw.rect(self.display_surface, COLORS['gray'], bg_rect, 0, 0, 12, 0, 12, 0)
 
-        v_offset = 0 if self.index < self.visible_items else -(self.index - self.visible_items + 1) * self.item_height
-        for index, monster in self.monsters.items():
-            # colors
-            bg_color = COLORS['gray'] if self.index != index else COLORS['light']
-            text_color = COLORS['white'] if self.selected_index != index else COLORS['gold']
-
-            top = self.main_rect.top + index * self.item_height + v_offset
-            item_rect = pygame.FRect(self.main_rect.left, top, self.list_width, self.item_height)
-
-            text_surf = self.fonts['regular'].render(monster.name, False, text_color)
-            text_rect = text_surf.get_frect(midleft = item_rect.midleft + pygame.Vector2(90, 0))
-
-            icon_surf = self.icon_frames[monster.name]
-            icon_rect = icon_surf.get_frect(center = item_rect.midleft + pygame.Vector2(45, 0))
-
-            if item_rect.colliderect(self.main_rect):
-                # check corners
-                if item_rect.collidepoint(self.main_rect.topleft):
-                    pygame.draw.rect(self.display_surface, bg_color, item_rect, 0, 0, 12)
-                elif item_rect.collidepoint(self.main_rect.bottomleft + pygame.Vector2(1, -1)):
-                    pygame.draw.rect(self.display_surface, bg_color, item_rect, 0, 0, 0, 0, 12, 0)
-                else:
-                    pygame.draw.rect(self.display_surface, bg_color, item_rect)
-
-                self.display_surface.blit(text_surf, text_rect)
-                self.display_surface.blit(icon_surf, icon_rect)
+        # only the rows in view, the team can be any size
+        self.list.draw(self.display_surface, self.main_rect.topleft, self.index, len(self.monsters), self.get_row_key, self.render_row)
 
         # lines
         for i in range(1, min(self.visible_items, len(self.monsters))):
@@ -109,7 +82,28 @@ class Team:
         shadow_surf.set_alpha(100)
         self.display_surface.blit(shadow_surf, (self.main_rect.left + self.list_width - 4, self.main_rect.top))
 
-    def display_main(self, dt: float) -> None:
+    def get_row_key(self, index: int) -> Tuple[str, bool, bool]:
+        return (self.monsters[index].name, self.index == index, self.selected_index == index)
+
+    def render_row(self, index: int, surf: pygame.Surface, corner: Optional[str]) -> None:
+        monster = self.monsters[index]
+        bg_color = COLORS['gray'] if self.index != index else COLORS['light']
+        text_color = COLORS['white'] if self.selected_index != index else COLORS['gold']
+        item_rect = pygame.FRect((0, 0), (self.list_width, self.item_height))
+
+        if corner == 'top':
+            pygame.draw.rect(surf, bg_color, item_rect, 0, 0, 12)
+        elif corner == 'bottom':
+            pygame.draw.rect(surf, bg_color, item_rect, 0, 0, 0, 0, 12, 0)
+        else:
+            pygame.draw.rect(surf, bg_color, item_rect)
+
+        text_surf = render_text(self.fonts['regular'], monster.name, False, text_color)
+        surf.blit(text_surf, text_surf.get_frect(midleft = item_rect.midleft + pygame.Vector2(90, 0)))
+        icon_surf = self.icon_frames[monster.name]
+        surf.blit(icon_surf, icon_surf.get_frect(center = item_rect.midleft + pygame.Vector2(45, 0)))
+
+    def display_main(self) -> None:
         # data
         monster = self.monsters[self.index]
 
@@ -122,18 +116,17 @@ class Team:
         pygame.draw.rect(self.display_surface, COLORS[monster.element], top_rect, 0, 0, 0, 12)
 
         # monster animation
-        self.frame_index += ANIMATION_SPEED * dt
         monster_surf = self.monster_frames[monster.name]['idle'][int(self.frame_index) % len(self.monster_frames[monster.name]['idle'])]
         monster_rect = monster_surf.get_frect(center = top_rect.center)
         self.display_surface.blit(monster_surf, monster_rect)
 
         # name
-        name_surf = self.fonts['bold'].render(monster.name, False, COLORS['white'])
+        name_surf = render_text(self.fonts['bold'], monster.name, False, COLORS['white'])
         name_rect = name_surf.get_frect(topleft = top_rect.topleft + pygame.Vector2(10, 10))
         self.display_surface.blit(name_surf, name_rect)
 
         # level
-        level_surf = self.fonts['regular'].render(f'Lvl: {monster.level}', False, COLORS['white'])
+        level_surf = render_text(self.fonts['regular'], f'Lvl: {monster.level}', False, COLORS['white'])
         level_rect = level_surf.get_frect(bottomleft = top_rect.bottomleft + pygame.Vector2(10, -10))
         self.display_surface.blit(level_surf, level_rect)
 
@@ -148,7 +141,7 @@ class Team:
         )
 
         # element
-        element_surf = self.fonts['regular'].render(monster.element, False, COLORS['white'])
+        element_surf = render_text(self.fonts['regular'], monster.element, False, COLORS['white'])
         element_rect = element_surf.get_frect(bottomright = top_rect.bottomright + pygame.Vector2(-10, -10))
         self.display_surface.blit(element_surf, element_rect)
 
@@ -163,13 +156,13 @@ class Team:
 
         healthbar_rect = pygame.FRect((0, 0), (bar_data['width'], bar_data['height'])).move_to(midtop = (bar_data['left_side'], bar_data['top']))
         draw_bar(self.display_surface, healthbar_rect, monster.health, monster.get_stat('max_health'), COLORS['red'], COLORS['black'], radius = 1)
-        hp_text = self.fonts['regular'].render(f"HP: {int(monster.health)} / {int(monster.get_stat('max_health'))}", False, COLORS['white'])
+        hp_text = render_text(self.fonts['regular'], f"HP: {int(monster.health)} / {int(monster.get_stat('max_health'))}", False, COLORS['white'])
         hp_rect = hp_text.get_frect(midleft = healthbar_rect.midleft + pygame.Vector2(10, 0))
         self.display_surface.blit(hp_text, hp_rect)
 
         energybar_rect = pygame.FRect((0, 0), (bar_data['width'], bar_data['height'])).move_to(midtop = (bar_data['right_side'], bar_data['top']))
         draw_bar(self.display_surface, energybar_rect, monster.energy, monster.get_stat('max_energy'), COLORS['blue'], COLORS['black'], radius = 1)
-        ep_text = self.fonts['regular'].render(f"Energy: {int(monster.energy)} / {int(monster.get_stat('max_energy'))}", False, COLORS['white'])
+        ep_text = render_text(self.fonts['regular'], f"Energy: {int(monster.energy)} / {int(monster.get_stat('max_energy'))}", False, COLORS['white'])
         ep_rect = ep_text.get_frect(midleft = energybar_rect.midleft + pygame.Vector2(10, 0))
         self.display_surface.blit(ep_text, ep_rect)
 
@@ -179,7 +172,7 @@ class Team:
 
         # stats
         stats_rect = pygame.FRect(sides['left'], healthbar_rect.bottom, healthbar_rect.width, info_height).inflate(0, -60).move(0, 15)
-        stats_text_surf = self.fonts['regular'].render('Stats', False, COLORS['white'])
+        stats_text_surf = render_text(self.fonts['regular'], 'Stats', False, COLORS['white'])
         stats_text_rect = stats_text_surf.get_frect(bottomleft = stats_rect.topleft)
         self.display_surface.blit(stats_text_surf, stats_text_rect)
 
@@ -198,7 +191,7 @@ class Team:
             self.display_surface.blit(icon_surf, icon_rect)
 
             # text
-            text_surf = self.fonts['regular'].render(stat, False, COLORS['white'])
+            text_surf = render_text(self.fonts['regular'], stat, False, COLORS['white'])
             text_rect = text_surf.get_frect(topleft = icon_rect.topleft + pygame.Vector2(30, -10))
             self.display_surface.blit(text_surf, text_rect)
 
@@ -208,22 +201,24 @@ class Team:
 
         # abilities
         ability_rect = stats_rect.copy().move_to(left = sides['right'])
-        ability_text_surf = self.fonts['regular'].render('Ability', False, COLORS['white'])
+        ability_text_surf = render_text(self.fonts['regular'], 'Ability', False, COLORS['white'])
         ability_text_rect = ability_text_surf.get_frect(bottomleft = ability_rect.topleft)
         self.display_surface.blit(ability_text_surf, ability_text_rect)
 
         for index, ability in enumerate(monster.get_abilities()):
             element = AttackData.get(ability)['element']
 
-            text_surf = self.fonts['regular'].render(ability, False, COLORS['black'])
+            text_surf = render_text(self.fonts['regular'], ability, False, COLORS['black'])
             x = ability_rect.left + index % 2 * ability_rect.width / 2
             y = 20 + ability_rect.top + int(index / 2) * (text_surf.get_height() + 20)
             rect = text_surf.get_frect(topleft = (x, y))
             pygame.draw.rect(self.display_surface, COLORS[element], rect.inflate(10, 10), 0, 4)
             self.display_surface.blit(text_surf, rect)
 
-    def update(self, dt: float) -> None:
-        self.input()
+    def simulate(self, dt: float) -> None:
+        self.frame_index += ANIMATION_SPEED * dt
+
+    def draw(self) -> None:
         self.display_surface.blit(self.tint_surf, (0, 0))
         self.display_list()
-        self.display_main(dt)
+        self.display_main()
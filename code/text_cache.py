@@ -0,0 +1,46 @@
+import pygame
+from collections import OrderedDict
+from settings import *
+from singleton import SingletonMeta
+from typing import Dict, Hashable, Tuple
+
+
+class TextCache(metaclass=SingletonMeta):
+    def __init__(self, max_size: int = TEXT_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # key -> (font, surface); the font is kept so its id cannot be reused while cached
+        self.entries: OrderedDict[Tuple[int, str, bool, Hashable], Tuple[pygame.font.Font, pygame.Surface]] = OrderedDict()
+
+    def render(self, font: pygame.font.Font, text: str, antialias: bool, color: Hashable) -> pygame.Surface:
+        key = (id(font), text, antialias, color)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[1]
+
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        self.entries[key] = (font, surf)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last = False)
+        return surf
+
+    def get_stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries),
+            'hit_rate': self.hits / total if total else 0
+        }
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = self.misses = 0
+
+
+def render_text(font: pygame.font.Font, text: str, antialias: bool, color: Hashable) -> pygame.Surface:
+    return TextCache().render(font, text, antialias, color)
@@ -1,4 +1,42 @@
+from heapq import heappush, heappop
 from pygame.time import get_ticks
+from singleton import SingletonMeta
+
+class TimerScheduler(metaclass=SingletonMeta):
+	"""Every active Timer ordered by due time, so a frame only touches the timers that fire."""
+	def __init__(self):
+		# (due time, schedule id, timer), entries of timers that were restarted or stopped since are skipped
+		self.queue = []
+		self.schedule_count = 0
+		# milliseconds, the fixed timestep loop swaps in its simulation clock
+		self.get_time = get_ticks
+
+	def set_time_source(self, get_time):
+		self.get_time = get_time
+
+	def schedule(self, timer):
+		self.schedule_count += 1
+		timer.schedule_id = self.schedule_count
+		heappush(self.queue, (timer.start_time + timer.duration, timer.schedule_id, timer))
+
+	def update(self, current_time = None):
+		# once per frame
+		current_time = self.get_time() if current_time is None else current_time
+		due = []
+		while self.queue and self.queue[0][0] <= current_time:
+			due.append(heappop(self.queue))
+
+		# timers restarted by a callback wait for the next frame, like they did when each one polled itself
+		for _, schedule_id, timer in due:
+			if schedule_id == timer.schedule_id and timer.active:
+				if current_time - timer.start_time >= timer.duration:
+					timer.fire()
+				else:
+					# the duration grew while it was running
+					self.schedule(timer)
+
+	def clear(self):
+		self.queue.clear()
 
 class Timer:
 	def __init__(self, duration, repeat = False, autostart = False, func = None):
@@ -7,23 +45,35 @@ class Timer:
 		self.active = False
 		self.repeat = repeat
 		self.func = func
+		self.schedule_id = 0
 		if autostart:
 			self.activate()
 
 	def activate(self):
 		self.active = True
-		self.start_time = get_ticks()
+		self.start_time = TimerScheduler().get_time()
+		TimerScheduler().schedule(self)
 
 	def deactivate(self):
 		self.active = False
 		self.start_time = 0
+		self.schedule_id = 0
 		if self.repeat:
 			self.activate()
 
+	def cancel(self):
+		# stops a repeating timer too, for owners that go away
+		self.active = False
+		self.start_time = 0
+		self.schedule_id = 0
+
+	def fire(self):
+		if self.func: self.func()
+		self.deactivate()
+
 	def update(self):
+		# the scheduler fires timers on its own, polling is only needed where it is not driven
 		if self.active:
-			current_time = get_ticks()
+			current_time = TimerScheduler().get_time()
 			if current_time - self.start_time >= self.duration:
-				if self.func: self.func()
-				self.deactivate()
-				
\ No newline at end of file
+				self.fire()
@@ -0,0 +1,57 @@
+import pygame
+from collections import OrderedDict
+from math import ceil
+from settings import *
+from typing import Callable, Hashable, Optional, Tuple
+
+# draws a row onto a blank surface of the row size, corner is 'top', 'bottom' or None for the window position
+RowRenderer = Callable[[int, pygame.Surface, Optional[str]], None]
+
+
+class VirtualList:
+    """
+    A scrolling list that only touches the rows in view.
+
+    The window scrolls so the selected row never goes past the anchor row. Every visible row is
+    blitted from a surface cached by the key the owner gives for it, so the key has to change
+    whenever what the row shows does.
+    """
+    def __init__(self, width: float, item_height: float, visible_items: int, anchor: Optional[int] = None, cache_size: int = LIST_ROW_CACHE_SIZE) -> None:
+        self.width = width
+        self.item_height = item_height
+        self.visible_items = visible_items
+        self.anchor = visible_items - 1 if anchor is None else anchor
+        self.cache_size = cache_size
+        self.rows: OrderedDict[Tuple[Hashable, Optional[str]], pygame.Surface] = OrderedDict()
+
+    def get_first(self, index: int) -> int:
+        return max(0, index - self.anchor)
+
+    def get_visible(self, index: int, count: int) -> range:
+        first = self.get_first(index)
+        return range(first, min(count, first + self.visible_items))
+
+    def get_row(self, row: int, key: Hashable, corner: Optional[str], render_row: RowRenderer) -> pygame.Surface:
+        cache_key = (key, corner)
+        surf = self.rows.get(cache_key)
+        if surf is not None:
+            self.rows.move_to_end(cache_key)
+            return surf
+
+        surf = pygame.Surface((ceil(self.width), ceil(self.item_height)), pygame.SRCALPHA)
+        render_row(row, surf, corner)
+        self.rows[cache_key] = surf
+        if len(self.rows) > self.cache_size:
+            self.rows.popitem(last = False)
+        return surf
+
+    def draw(self, surface: pygame.Surface, topleft: Tuple[float, float], index: int, count: int, get_key: Callable[[int], Hashable], render_row: RowRenderer) -> None:
+        left, top = topleft
+        first = self.get_first(index)
+        for row in self.get_visible(index, count):
+            position = row - first
+            corner = 'top' if position == 0 else 'bottom' if position == self.visible_items - 1 else None
+            surface.blit(self.get_row(row, get_key(row), corner, render_row), (left, top + position * self.item_height))
+
+    def clear(self) -> None:
+        self.rows.clear()